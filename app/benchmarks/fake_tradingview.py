@@ -0,0 +1,364 @@
+import base64
+import functools
+import hashlib
+import json
+import logging
+import os
+import socketserver
+import struct
+import threading
+import time
+from collections import Counter
+from app.tvDatafeed.protocol import FrameDecoder, decode_message, prepend_header
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "tests", "fixtures", "tradingview"
+)
+SESSION_FIXTURE = os.path.join(FIXTURE_DIR, "set_daily_session.txt")
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+BARS_PLACEHOLDER = '"__bars__"'
+
+
+def load_session(path=SESSION_FIXTURE):
+    """
+    Reads a recorded session: a "> <request>" line names the client message
+    that the following lines, one server websocket message each, answer.
+    """
+    replies = {}
+    request = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.startswith("> "):
+                request = line[2:]
+                replies[request] = []
+            elif line:
+                replies[request].append(FrameDecoder().feed(line))
+    return replies
+
+
+class RecordedSession:
+    """
+    Replays a recorded session for any client: session, series and symbol ids
+    are swapped for the client's and the recorded bars are repeated, with
+    their recorded spacing, into a synthetic history of history_bars bars.
+    """
+
+    def __init__(self, path=SESSION_FIXTURE, history_bars=10000):
+        self.replies = load_session(path)
+        self.history_bars = history_bars
+        recorded = next(
+            update["s"]
+            for func, params in self.__messages("create_series")
+            if func == "timescale_update"
+            for update in params[1].values()
+        )
+        self.__values = [bar["v"][1:] for bar in recorded]
+        gaps = [b["v"][0] - a["v"][0] for a, b in zip(recorded, recorded[1:])]
+        self.__gaps = gaps or [86400]
+        self.__last_time = recorded[-1]["v"][0]
+
+    def __messages(self, request):
+        for message in self.replies.get(request, []):
+            for payload in message:
+                if payload.startswith("{"):
+                    parsed = json.loads(payload)
+                    if "m" in parsed:
+                        yield parsed["m"], parsed["p"]
+
+    @functools.lru_cache(maxsize=64)
+    def bars(self, start, stop):
+        """JSON list of synthetic bars [start, stop), 0 being the oldest"""
+        bars = []
+        for position in range(max(start, 0), stop):
+            timestamp = self.__time_back(self.history_bars - 1 - position)
+            values = self.__values[position % len(self.__values)]
+            bars.append({"i": len(bars), "v": [timestamp, *values]})
+        return json.dumps(bars, separators=(",", ":"))
+
+    def __time_back(self, back):
+        # the recorded gaps repeat backwards from the last recorded bar
+        cycles, rest = divmod(back, len(self.__gaps))
+        return (
+            self.__last_time
+            - cycles * sum(self.__gaps)
+            - sum(self.__gaps[len(self.__gaps) - rest :])
+        )
+
+    def reply(self, request, session, series_id=None, symbol_id=None, symbol=None):
+        """the recorded websocket messages answering request, as template strings"""
+        messages = []
+        for message in self.replies.get(request, []):
+            payloads = []
+            for payload in message:
+                if payload.startswith("{") and '"m":' in payload:
+                    payload = self.__retarget(
+                        json.loads(payload), session, series_id, symbol_id, symbol
+                    )
+                payloads.append(payload)
+            messages.append(payloads)
+        return messages
+
+    @staticmethod
+    def __retarget(message, session, series_id, symbol_id, symbol):
+        params = message["p"]
+        params[0] = session
+        if message["m"] == "timescale_update":
+            (update,) = params[1].values()
+            update["s"] = "__bars__"
+            params[1] = {series_id: update}
+        elif message["m"] == "symbol_resolved" or message["m"] == "symbol_error":
+            params[1] = symbol_id
+        elif message["m"] in ("series_loading", "series_completed"):
+            params[1] = series_id
+        elif message["m"] == "qsd":
+            params[1]["n"] = symbol
+        elif message["m"] == "quote_completed":
+            params[1] = symbol
+        return json.dumps(message, separators=(",", ":"))
+
+
+class _Connection(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.symbols = {}  # symbol id -> symbol
+        self.loaded = {}  # series id -> bars sent
+        self.replies = 0
+        self.heartbeats = 0
+
+    def handle(self):
+        server = self.server
+        if not self.handshake():
+            return
+        with server.lock:
+            server.connections += 1
+        self.send_recorded(server.session.reply("connect", None))
+
+        decoder = FrameDecoder()
+        while True:
+            data = self.recv_message()
+            if data is None:
+                return
+            for payload in decoder.feed(data):
+                if payload.startswith("~h~"):
+                    continue
+                func, params = decode_message(payload)
+                with server.lock:
+                    server.requests[func] += 1
+                if not self.answer(func, params):
+                    # drop the socket without a close frame, like a lost connection
+                    return
+
+    def handshake(self):
+        request = self.rfile.readline(65537).decode("latin-1")
+        headers = {}
+        while True:
+            line = self.rfile.readline(65537).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if not self.server.admit():
+            self.wfile.write(
+                b"HTTP/1.1 429 Too Many Requests\r\nContent-Length: 0\r\n\r\n"
+            )
+            return False
+        key = headers.get("sec-websocket-key")
+        if not request.startswith("GET ") or key is None:
+            self.wfile.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            return False
+        accept = base64.b64encode(
+            hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()
+        ).decode()
+        self.wfile.write(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode()
+        )
+        return True
+
+    def recv_message(self):
+        fragments = []
+        while True:
+            header = self.rfile.read(2)
+            if len(header) < 2:
+                return None
+            opcode, length = header[0] & 0x0F, header[1] & 0x7F
+            if length == 126:
+                (length,) = struct.unpack("!H", self.rfile.read(2))
+            elif length == 127:
+                (length,) = struct.unpack("!Q", self.rfile.read(8))
+            mask = self.rfile.read(4) if header[1] & 0x80 else None
+            payload = self.rfile.read(length)
+            if mask:
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+            if opcode == 0x8:
+                self.send_frame(0x8, payload[:2])
+                return None
+            if opcode == 0x9:
+                self.send_frame(0xA, payload)
+                continue
+            if opcode in (0x0, 0x1, 0x2):
+                fragments.append(payload)
+                if header[0] & 0x80:
+                    return b"".join(fragments).decode("utf-8")
+
+    def send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        self.wfile.write(header + payload)
+
+    def send_text(self, text):
+        data = text.encode("utf-8")
+        self.send_frame(0x1, data)
+        if self.server.bandwidth:
+            time.sleep(len(data) / self.server.bandwidth)
+
+    def send_recorded(self, messages, bars="[]"):
+        for payloads in messages:
+            self.send_text(
+                "".join(
+                    prepend_header(payload.replace(BARS_PLACEHOLDER, bars))
+                    for payload in payloads
+                )
+            )
+
+    def answer(self, func, params):
+        server = self.server
+        session = server.session
+        if func == "quote_add_symbols":
+            self.send_recorded(session.reply(func, params[0], symbol=params[1]))
+        elif func == "resolve_symbol":
+            symbol = json.loads(params[2][1:])["symbol"]
+            self.symbols[params[1]] = symbol
+            if any(marker in symbol for marker in server.invalid_symbols):
+                self.send_recorded(
+                    session.reply("symbol_error", params[0], symbol_id=params[1])
+                )
+            else:
+                self.send_recorded(session.reply(func, params[0], symbol_id=params[1]))
+        elif func in ("create_series", "request_more_data"):
+            symbol_id = params[3] if func == "create_series" else None
+            symbol = self.symbols.get(symbol_id, "")
+            if any(marker in symbol for marker in server.invalid_symbols):
+                return True
+            if not self.count_reply():
+                return False
+            if server.latency:
+                time.sleep(server.latency)
+
+            self.heartbeats += 1
+            self.send_text(prepend_header(f"~h~{self.heartbeats}"))
+            series_id = params[1]
+            n_bars = params[5] if func == "create_series" else params[2]
+            loaded = self.loaded.get(series_id, 0) if func != "create_series" else 0
+            stop = session.history_bars - loaded
+            self.loaded[series_id] = loaded + min(n_bars, max(stop, 0))
+            self.send_recorded(
+                session.reply(func, params[0], series_id=series_id),
+                session.bars(max(stop - n_bars, 0), max(stop, 0)),
+            )
+        elif func == "remove_series":
+            self.loaded.pop(params[1], None)
+        return True
+
+    def count_reply(self):
+        self.replies += 1
+        limit = self.server.disconnect_after
+        return limit is None or self.replies <= limit
+
+
+class FakeTradingViewServer(socketserver.ThreadingTCPServer):
+    """
+    Local stand-in for the TradingView chart websocket, replaying a recorded
+    session so that TvDatafeed can be tested and benchmarked offline.
+
+    Args:
+        host (str): Interface to listen on.
+        port (int): Port to listen on, 0 picks a free one.
+        session (RecordedSession, optional): The recording to replay.
+        latency (float): Seconds waited before answering each series request.
+        bandwidth (float, optional): Bytes per second sent on each connection.
+        max_connections_per_second (int, optional): Handshakes beyond it are
+            refused with HTTP 429, as TradingView throttles clients.
+        disconnect_after (int, optional): Series requests answered on each
+            connection before the socket is dropped.
+        invalid_symbols (tuple): Symbols containing any of these are answered
+            with the recorded symbol_error.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        session=None,
+        latency=0.0,
+        bandwidth=None,
+        max_connections_per_second=None,
+        disconnect_after=None,
+        invalid_symbols=("INVALID",),
+    ):
+        super().__init__((host, port), _Connection)
+        self.session = session or RecordedSession()
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.max_connections_per_second = max_connections_per_second
+        self.disconnect_after = disconnect_after
+        self.invalid_symbols = invalid_symbols
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.refused = 0
+        self.requests = Counter()
+        self.__handshakes = []
+        self.__thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"ws://{host}:{port}/socket.io/websocket"
+
+    def admit(self):
+        if self.max_connections_per_second is None:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.__handshakes = [t for t in self.__handshakes if now - t < 1]
+            if len(self.__handshakes) >= self.max_connections_per_second:
+                self.refused += 1
+                return False
+            self.__handshakes.append(now)
+            return True
+
+    def start(self):
+        self.__thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self.__thread.start()
+        logger.debug(f"fake TradingView server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,125 @@
+import argparse
+import random
+import re
+import time
+from app.benchmarks.html_extraction import load_corpus
+from app.services.data_processing_3 import (
+    AMOUNT,
+    EPS_MARKER,
+    EPS_VALUE,
+    PROFIT_MARKER,
+    YEAR,
+    financial_quarter,
+    tokenize_financial_content,
+)
+from app.services.html_extract import extract_content_text
+
+
+def legacy_scan(content):
+    # The four full-text regex scans parse_financial_content used before
+    # the single-pass tokenizer, kept as the baseline to compare against.
+    is12Months = re.search(r"12 Months|Yearly", content)
+    quarter = (
+        re.findall(r"12 Months", content)
+        if is12Months
+        else re.findall(r"Quarter\s[1-3]", content)
+    )
+    profit_or_loss_list = re.findall(
+        r"Increase|Profit|\(?\d{1,3},?\d{1,3},?\d{1,3}\.?\d{1,4}\)?|\(?\d{1,3}\.\d{1,3}\)?|\(?\d{1,3}\)?",
+        content,
+    )
+    years = re.findall(r"20\d{2}|Increase|Profit", content)
+    eps_list = re.findall(
+        r"EPS|(?:\(\d{1,3}[\.]\d+\)?)|(?:\d{1,2}[\.]\d{1,8})", content
+    )
+    return (
+        quarter[0] if quarter else "12 Months",
+        profit_or_loss_list,
+        years,
+        eps_list,
+    )
+
+
+def tokenized_scan(content):
+    tokens = tokenize_financial_content(content)
+    return (
+        financial_quarter(tokens),
+        [text for kind, text in tokens if kind in (AMOUNT, PROFIT_MARKER)],
+        [text for kind, text in tokens if kind in (YEAR, PROFIT_MARKER)],
+        [text for kind, text in tokens if kind in (EPS_VALUE, EPS_MARKER)],
+    )
+
+
+FRAGMENTS = [
+    "Increase",
+    "Profit",
+    "EPS",
+    "Yearly",
+    "12 Months",
+    "112 Months",
+    "Quarter 1",
+    "Quarter\n3",
+    "Quarter 4",
+    "2024",
+    "2023",
+    "12,345",
+    "(1,234,567)",
+    "0.11",
+    "(0.04)",
+    "1.2345678",
+    "16.7511",
+    "31",
+    "(F45-3)",
+    "(In thousands)",
+    "Profitability",
+    "Increased",
+    " ",
+    "\n",
+    ",",
+    ".",
+    "(",
+    ")",
+    "baht",
+    "Months",
+]
+
+
+def random_documents(count, seed=45, length=80):
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, length)))
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the single-pass financial tokenizer with the legacy regex scans"
+    )
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    documents = [extract_content_text(document) for document in load_corpus().values()]
+    mismatches = sum(
+        legacy_scan(document) != tokenized_scan(document)
+        for document in documents + random_documents(2000)
+    )
+
+    results = {}
+    for name, scan in (("legacy", legacy_scan), ("tokenizer", tokenized_scan)):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for document in documents:
+                scan(document)
+        results[name] = (time.perf_counter() - started) / (args.repeat * len(documents))
+
+    print(f"{len(documents)} documents x {args.repeat} repeats")
+    for name, per_document in results.items():
+        print(f"{name:>9}: {per_document * 1e6:8.1f} us/document")
+    print(f"speedup: {results['legacy'] / results['tokenizer']:.2f}x")
+    if mismatches:
+        print(f"MISMATCHED OUTPUT: {mismatches} documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import glob
+import os
+import time
+from app.services.html_extract import EXTRACTION_BACKENDS
+
+FIXTURE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "tests", "fixtures", "f45"
+)
+
+
+def load_corpus(fixture_dir=FIXTURE_DIR):
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            corpus[os.path.basename(path)] = f.read()
+    return corpus
+
+
+def benchmark(corpus, repeat):
+    documents = list(corpus.values())
+    results = {}
+    for name, extract in EXTRACTION_BACKENDS.items():
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for document in documents:
+                extract(document)
+        elapsed = time.perf_counter() - started
+        results[name] = elapsed / (repeat * len(documents))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare raw-html extraction backends on a fixture corpus"
+    )
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.fixtures)
+    mismatches = [
+        name
+        for name, document in corpus.items()
+        if EXTRACTION_BACKENDS["fast"](document) != EXTRACTION_BACKENDS["bs4"](document)
+    ]
+    results = benchmark(corpus, args.repeat)
+
+    print(f"{len(corpus)} documents x {args.repeat} repeats")
+    for name, per_document in results.items():
+        print(f"{name:>6}: {per_document * 1e6:10.1f} us/document")
+    print(f"speedup: {results['bs4'] / results['fast']:.1f}x")
+    if mismatches:
+        print(f"MISMATCHED OUTPUT: {', '.join(mismatches)}")
+
+
+if __name__ == "__main__":
+    main()
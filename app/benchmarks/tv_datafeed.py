@@ -0,0 +1,142 @@
+import argparse
+import json
+import multiprocessing
+import statistics
+import time
+from contextlib import contextmanager
+from app.benchmarks.fake_tradingview import FakeTradingViewServer
+from app.tvDatafeed.datafeed import TvDatafeedLive
+from app.tvDatafeed.main import Interval, TvDatafeed
+
+
+def serve(connection, options):
+    server = FakeTradingViewServer(**options)
+    connection.send(server.url)
+    server.serve_forever()
+
+
+@contextmanager
+def fake_server(in_process=False, **options):
+    """
+    Yields the url of a fake TradingView server. It runs in a child process
+    by default so that it does not compete with the client for the GIL.
+    """
+    if in_process:
+        with FakeTradingViewServer(**options) as server:
+            yield server.url
+        return
+
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=serve, args=(sender, options), daemon=True)
+    process.start()
+    try:
+        yield receiver.recv()
+    finally:
+        process.terminate()
+        process.join()
+
+
+def bench_get_hist(url, n_bars, repeat):
+    tv = TvDatafeed(ws_url=url)
+    tv.get_hist("PTT", "SET", Interval.in_daily, n_bars=n_bars)  # connect first
+    bars = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        bars += len(tv.get_hist("PTT", "SET", Interval.in_daily, n_bars=n_bars))
+    elapsed = time.perf_counter() - started
+    tv.close()
+    return {"bars_per_second": bars / elapsed, "requests_per_second": repeat / elapsed}
+
+
+def bench_get_hist_many(url, n_bars, symbols):
+    tv = TvDatafeed(ws_url=url)
+    names = [f"S{i}" for i in range(symbols)]
+    started = time.perf_counter()
+    bars = sum(
+        len(data)
+        for _, data in tv.get_hist_many(names, "SET", Interval.in_daily, n_bars=n_bars)
+        if data is not None
+    )
+    elapsed = time.perf_counter() - started
+    tv.close()
+    return {"bars_per_second": bars / elapsed, "symbols_per_second": symbols / elapsed}
+
+
+def bench_connections(url, repeat):
+    tv = TvDatafeed(ws_url=url)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        # a fresh connection and sessions for every request
+        tv.close()
+        tv.get_hist("PTT", "SET", Interval.in_daily, n_bars=1)
+    elapsed = time.perf_counter() - started
+    tv.close()
+    return {"connections_per_second": repeat / elapsed}
+
+
+def bench_live_feed(url, seises, rounds):
+    # When an interval expires the live feed fetches the two latest bars of
+    # every Seis in turn, so a round lasts until the last Seis has its bar.
+    tv = TvDatafeedLive(ws_url=url)
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for i in range(seises):
+            tv.get_hist(f"S{i}", "SET", Interval.in_1_minute, n_bars=2)
+        latencies.append(time.perf_counter() - started)
+    tv.close()
+    latencies.sort()
+    return {
+        "round_p50_ms": statistics.median(latencies) * 1e3,
+        "round_p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1e3,
+        "per_seis_ms": statistics.mean(latencies) / seises * 1e3,
+    }
+
+
+def run(args):
+    options = {
+        "latency": args.latency,
+        "bandwidth": args.bandwidth,
+        "disconnect_after": args.disconnect_after,
+    }
+    with fake_server(args.in_process, **options) as url:
+        return {
+            "get_hist": bench_get_hist(url, args.bars, args.repeat),
+            "get_hist_many": bench_get_hist_many(url, args.bars, args.symbols),
+            "connections": bench_connections(url, args.connections),
+            "live_feed": bench_live_feed(url, args.seises, args.rounds),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure TvDatafeed throughput against a local fake TradingView server"
+    )
+    parser.add_argument("--bars", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--seises", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per reply")
+    parser.add_argument("--bandwidth", type=float, help="bytes per second")
+    parser.add_argument("--disconnect-after", type=int, help="replies per connection")
+    parser.add_argument("--in-process", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.bars} bars per request, {args.latency * 1e3:.0f} ms latency")
+    for name, metrics in results.items():
+        print(
+            f"{name:>13}: "
+            + ", ".join(f"{metric} {value:,.1f}" for metric, value in metrics.items())
+        )
+
+
+if __name__ == "__main__":
+    main()
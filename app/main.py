@@ -4,7 +4,7 @@ import os
 from app.services.fetch_news_2 import (
     setup_session_with_proxy,
     fetch_symbols_from_mongo,
-    fetch_and_save_news,
+    fetch_and_save_news_concurrently,
 )
 from app.services.fetch_and_save_symbols_1 import fetch_and_insert_symbols
 from app.services.data_processing_3 import fetch_process_save_news_items
@@ -28,10 +28,12 @@ def run_job(job_id):
             fetch_and_insert_symbols()
             logging.info("Symbols fetched and saved successfully")
         elif job_id == "2":
-            session = setup_session_with_proxy(proxy_enabled=False)
+            workers = int(os.getenv("NEWS_FETCH_WORKERS", "10"))
+            session = setup_session_with_proxy(
+                proxy_enabled=False, pool_maxsize=workers
+            )
             symbols = fetch_symbols_from_mongo()
-            for symbol in symbols:
-                fetch_and_save_news(session, symbol)
+            fetch_and_save_news_concurrently(session, symbols, max_workers=workers)
             logging.info("News fetched and saved successfully")
         elif job_id == "3":
             fetch_process_save_news_items()
@@ -1,11 +1,21 @@
 import logging
 from datetime import datetime
-import requests
-from pymongo import MongoClient, errors, ASCENDING
-from bs4 import BeautifulSoup
+from pymongo import DeleteMany, MongoClient, UpdateOne, errors, ASCENDING
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from .utils import db
+import queue
+import threading
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from .html_cache import HtmlCache
+from .html_extract import extract_content_text
+from .http_fetcher import HttpFetcher
+from .utils import BulkWriter, db, run_bounded
 from dotenv import load_dotenv
 import os
 
@@ -24,6 +34,11 @@ client = MongoClient(mongo_uri)
 news_collection = db["news"]
 processed_collection = db["processed"]
 
+NEWS_BATCH_SIZE = 500
+
+html_cache = HtmlCache()
+http_fetcher = HttpFetcher(pool_maxsize=int(os.getenv("JOB3_IO_WORKERS", "20")))
+
 
 def convert_to_numbers(input_list, url):
     result = []
@@ -45,31 +60,83 @@ def convert_to_numbers(input_list, url):
     return result
 
 
-def parse_financial_content(content, news_item, url):
-    soup = BeautifulSoup(content, "html.parser")
-    content_selector = "raw-html"
-    content_block = soup.find("div", {"class": content_selector})
-    content = content_block.text if content_block else "N/A"
+# Token kinds emitted by tokenize_financial_content
+AMOUNT = "amount"
+YEAR = "year"
+EPS_VALUE = "eps"
+PROFIT_MARKER = "profit_marker"
+EPS_MARKER = "eps_marker"
+QUARTER_SECTION = "quarter_section"
+YEARLY_SECTION = "yearly_section"
+
+# Numbers only ever span digits, commas, dots and parentheses, so every
+# numeric match lies inside one such run and the runs can be split further
+# with the per-list grammars below.
+FINANCIAL_TOKEN_RE = re.compile(
+    r"(Increase|Profit)|(EPS)|(Yearly)|Quarter\s(?=[1-3])|([\d,.()]+)(?:(?<=12)( Months))?"
+)
+AMOUNT_RE = re.compile(
+    r"\(?\d{1,3},?\d{1,3},?\d{1,3}\.?\d{1,4}\)?|\(?\d{1,3}\.\d{1,3}\)?|\(?\d{1,3}\)?"
+)
+YEAR_RE = re.compile(r"20\d{2}")
+EPS_VALUE_RE = re.compile(r"(?:\(\d{1,3}[\.]\d+\)?)|(?:\d{1,2}[\.]\d{1,8})")
 
-    logging.info(f"Parsing financial content for URL: {url}")
 
-    is12Months = re.search(r"12 Months|Yearly", content)
-    quarter = (
-        re.findall(r"12 Months", content)
-        if is12Months
-        else re.findall(r"Quarter\s[1-3]", content)
+@lru_cache(maxsize=4096)
+def split_numeric_run(run):
+    return (
+        [(AMOUNT, text) for text in AMOUNT_RE.findall(run)]
+        + [(YEAR, text) for text in YEAR_RE.findall(run)]
+        + [(EPS_VALUE, text) for text in EPS_VALUE_RE.findall(run)]
     )
 
-    profit_or_loss_list = re.findall(
-        r"Increase|Profit|\(?\d{1,3},?\d{1,3},?\d{1,3}\.?\d{1,4}\)?|\(?\d{1,3}\.\d{1,3}\)?|\(?\d{1,3}\)?",
-        content,
-    )
 
-    years = re.findall(r"20\d{2}|Increase|Profit", content)
+def tokenize_financial_content(content):
+    """
+    Scans the content once and returns typed (kind, text) tokens in document
+    order: amounts, years and EPS values from numeric runs, the Increase,
+    Profit and EPS markers, and the Quarter/12 Months/Yearly section markers.
+    """
+    tokens = []
+    for match in FINANCIAL_TOKEN_RE.finditer(content):
+        profit_marker, eps_marker, yearly, run, months = match.groups()
+        if run is not None:
+            tokens.extend(split_numeric_run(run))
+            if months:
+                tokens.append((YEARLY_SECTION, "12 Months"))
+        elif profit_marker is not None:
+            tokens.append((PROFIT_MARKER, profit_marker))
+        elif eps_marker is not None:
+            tokens.append((EPS_MARKER, eps_marker))
+        elif yearly is not None:
+            tokens.append((YEARLY_SECTION, yearly))
+        else:
+            tokens.append((QUARTER_SECTION, content[match.start() : match.end() + 1]))
+    return tokens
+
+
+def financial_quarter(tokens):
+    quarter = None
+    for kind, text in tokens:
+        if kind == YEARLY_SECTION:
+            return "12 Months"
+        if kind == QUARTER_SECTION and quarter is None:
+            quarter = text
+    return quarter or "12 Months"
 
-    eps_list = re.findall(
-        r"EPS|(?:\(\d{1,3}[\.]\d+\)?)|(?:\d{1,2}[\.]\d{1,8})", content
-    )
+
+def parse_financial_content(content, news_item, url):
+    content = extract_content_text(content)
+
+    logging.info(f"Parsing financial content for URL: {url}")
+
+    tokens = tokenize_financial_content(content)
+    quarter = financial_quarter(tokens)
+    profit_or_loss_list = [
+        text for kind, text in tokens if kind in (AMOUNT, PROFIT_MARKER)
+    ]
+    years = [text for kind, text in tokens if kind in (YEAR, PROFIT_MARKER)]
+    eps_list = [text for kind, text in tokens if kind in (EPS_VALUE, EPS_MARKER)]
 
     indexProfitOrLoss = 0
 
@@ -94,7 +161,7 @@ def parse_financial_content(content, news_item, url):
     processed_data = {
         "url": url,
         "symbol": news_item["symbol"],
-        "quarter": quarter[0] if quarter else "12 Months",
+        "quarter": quarter,
         "datetime": date_object,
         "PnL": convert_to_numbers(profit_or_loss_list, url),
         "years": convert_to_numbers(years, url),
@@ -114,35 +181,42 @@ def parse_financial_content(content, news_item, url):
 
 
 def fetch_url(url):
-    retries = 3
-    for attempt in range(retries):
-        try:
-            logging.info(f"Fetching URL: {url}, Attempt: {attempt + 1}")
-            response = requests.get(url, timeout=60)
-            if response.status_code == 200:
-                logging.info(f"Successfully fetched URL: {url}")
-                return response.text
-            else:
-                logging.warning(
-                    f"Failed to fetch URL: {url} - Status code: {response.status_code}"
-                )
-        except requests.RequestException as e:
-            logging.error(f"Error fetching URL: {url} on attempt {attempt + 1} - {e}")
-            if attempt + 1 == retries:
-                raise
+    logging.info(f"Fetching URL: {url}")
+    response = http_fetcher.get(url)
+    if response.status_code == 200:
+        logging.info(f"Successfully fetched URL: {url}")
+        return response.text
+    logging.warning(f"Failed to fetch URL: {url} - Status code: {response.status_code}")
     return None
 
 
-def fetch_and_process_news_item(news_item):
-    if "(F45)" in news_item["headline"]:
-        url = news_item["url"]
-        logging.info(f"Fetching and processing news item for URL: {url}")
-        content = fetch_url(url)
-        if content:
-            return parse_financial_content(content, news_item, url)
-    else:
+def fetch_content(url, cache_only=False):
+    content = html_cache.get(url)
+    if content is not None:
+        logging.info(f"Using cached content for URL: {url}")
+        return content
+    if cache_only:
+        logging.warning(f"No cached content for URL: {url}, skipping")
+        return None
+
+    content = fetch_url(url)
+    if content:
+        html_cache.put(url, content)
+    return content
+
+
+def fetch_news_content(news_item, cache_only=False):
+    if "(F45)" not in news_item["headline"]:
         logging.info(f"Skipping news item with headline: {news_item['headline']}")
-    return None
+        return None
+    logging.info(f"Fetching news item for URL: {news_item['url']}")
+    return fetch_content(news_item["url"], cache_only)
+
+
+def parse_news_content(content, news_item, url):
+    # Runs in a parse worker process, so it only receives the fields it needs
+    result = parse_financial_content(content, news_item, url)
+    return reshape_data(process_data([result])) if result else []
 
 
 def process_data(data):
@@ -232,72 +306,205 @@ def reshape_data(data):
     return reshaped_data
 
 
-def save_to_db(entries):
-    try:
-        logging.info(f"Saving {len(entries)} entries to the database")
-        # Sort the entries by Symbol, Year, and Datetime before saving
-        sorted_entries = sorted(
-            entries,
-            key=lambda x: (x["Symbol"], x["Year"], x["Datetime"]),
-            reverse=False,
+def ensure_processed_indexes():
+    # Optimizes queries by Symbol, Year, and Datetime
+    processed_collection.create_index(
+        [("Symbol", ASCENDING), ("Year", ASCENDING), ("Datetime", ASCENDING)]
+    )
+    # Serves both the save_to_db upsert filter and lookups by Url
+    processed_collection.create_index(
+        [
+            ("Url", ASCENDING),
+            ("Symbol", ASCENDING),
+            ("Year", ASCENDING),
+            ("Quarter", ASCENDING),
+        ]
+    )
+    logging.info("Ensured indexes on the processed collection")
+
+
+def save_to_db(entries, writer, ack=None, replace_url=None):
+    # Reparsed entries replace every entry of their Url, since a parser fix
+    # may change the Year or Quarter that the upsert is keyed on
+    operations = [DeleteMany({"Url": replace_url})] if replace_url else []
+    operations += [
+        UpdateOne(
+            {
+                "Url": entry["Url"],
+                "Symbol": entry["Symbol"],
+                "Year": entry["Year"],
+                "Quarter": entry["Quarter"],
+            },
+            {"$set": entry},
+            upsert=True,
         )
+        for entry in entries
+    ]
+    logging.info(f"Queueing {len(operations)} entries for the database")
+    writer.add(operations, ack)
 
-        for entry in sorted_entries:
-            try:
-                # Insert the entry into the MongoDB collection
-                inserted = processed_collection.insert_one(entry)
-                if inserted.acknowledged:
-                    logging.info(
-                        f"Inserted {entry['Symbol']} for {entry['Quarter']} successfully"
-                    )
-            except errors.PyMongoError as e:
-                logging.error(f"Error inserting to MongoDB: {e}")
 
-        # Create an index on the fields Symbol, Year, and Datetime to optimize queries
-        processed_collection.create_index(
-            [("Symbol", ASCENDING), ("Year", ASCENDING), ("Datetime", ASCENDING)]
-        )
-        logging.info("Created index on Symbol, Year, and Datetime fields in MongoDB")
+def ensure_news_processed_flags():
+    news_collection.create_index(
+        [("processed", ASCENDING), ("_id", ASCENDING)],
+        partialFilterExpression={"processed": False},
+        name="unprocessed_news",
+    )
 
-    except Exception as e:
-        logging.error(f"Error sorting and saving entries to MongoDB: {e}")
+    if not news_collection.find_one({"processed": {"$exists": False}}, {"_id": 1}):
+        return
+
+    logging.info("Backfilling processed flag on news items")
+    result = news_collection.update_many(
+        {"processed": {"$exists": False}}, {"$set": {"processed": False}}
+    )
+    logging.info(f"Flagged {result.modified_count} news items as unprocessed")
+
+    batch = []
+    marked = 0
+    for item in processed_collection.find({}, {"Url": 1, "_id": 0}).batch_size(
+        NEWS_BATCH_SIZE
+    ):
+        if "Url" in item:
+            batch.append(item["Url"])
+        if len(batch) >= NEWS_BATCH_SIZE:
+            marked += mark_urls_processed(batch)
+            batch = []
+    if batch:
+        marked += mark_urls_processed(batch)
+    logging.info(f"Flagged {marked} already processed news items as processed")
+
+
+def mark_urls_processed(urls):
+    result = news_collection.update_many(
+        {"url": {"$in": urls}, "processed": False}, {"$set": {"processed": True}}
+    )
+    return result.modified_count
 
 
-def fetch_process_save_news_items():
+def mark_news_processed(news_ids):
+    news_collection.update_many(
+        {"_id": {"$in": news_ids}}, {"$set": {"processed": True}}
+    )
+    logging.info(f"Marked {len(news_ids)} news items as processed")
+
+
+def fetch_process_save_news_items(
+    reparse_from_cache=None, io_workers=None, parse_workers=None
+):
+    io_workers = io_workers or int(os.getenv("JOB3_IO_WORKERS", "20"))
+    parse_workers = parse_workers or int(
+        os.getenv("JOB3_PARSE_WORKERS", str(os.cpu_count() or 1))
+    )
+    if reparse_from_cache is None:
+        reparse_from_cache = os.getenv("REPARSE_FROM_CACHE", "false").lower() in (
+            "1",
+            "true",
+        )
     try:
-        logging.info("Starting fetch, process, and save of news items")
-        processed_urls = {
-            item["Url"]
-            for item in processed_collection.find({}, {"Url": 1})
-            if "Url" in item
-        }
         logging.info(
-            f"Fetched {len(processed_urls)} processed URLs from the collection"
+            f"Starting fetch, process, and save of news items with {io_workers} "
+            f"fetch threads and {parse_workers} parse processes"
+        )
+        ensure_processed_indexes()
+        ensure_news_processed_flags()
+        if reparse_from_cache:
+            # Reprocess the whole history offline from the HTML cache
+            logging.info("Reparsing all news items from the HTML cache only")
+            query = {}
+        else:
+            query = {"processed": False}
+        news_items = (
+            news_collection.find(query)
+            .sort("_id", ASCENDING)
+            .batch_size(NEWS_BATCH_SIZE)
         )
-
-        news_items = list(news_collection.find({"url": {"$nin": list(processed_urls)}}))
-        logging.info(f"Fetched {len(news_items)} news items from the collection")
-
     except errors.PyMongoError as e:
-        logging.error(f"Error fetching processed URLs or news items: {e}")
+        logging.error(f"Error preparing unprocessed news items: {e}")
         return
 
-    with ThreadPoolExecutor(max_workers=20) as executor:
-        future_to_news_item = {
-            executor.submit(fetch_and_process_news_item, news_item): news_item
-            for news_item in news_items
-        }
-        for future in as_completed(future_to_news_item):
-            news_item = future_to_news_item[future]
-            try:
-                result = future.result()
-                if result:
-                    symbol = result["symbol"]
-                    logging.info(f"Processing symbol: {symbol}")
-                    processed_symbol_data = process_data([result])
-                    reshaped_data = reshape_data(processed_symbol_data)
-                    save_to_db(reshaped_data)
-            except Exception as e:
-                logging.error(f"Error processing news item {news_item['url']}: {e}")
+    writer = BulkWriter(
+        processed_collection,
+        on_flush=mark_news_processed,
+        ordered=reparse_from_cache,
+    )
+    fetched = queue.Queue(maxsize=parse_workers * 4)
+    fetch_thread = threading.Thread(
+        target=fetch_stage,
+        args=(news_items, fetched, io_workers, reparse_from_cache),
+        daemon=True,
+    )
+
+    pending = {}
+    with writer, ProcessPoolExecutor(
+        max_workers=parse_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as parse_pool:
+        fetch_thread.start()
+        while True:
+            item = fetched.get()
+            if item is None:
+                break
+            news_item, content = item
+            if content is None:
+                if "(F45)" not in news_item["headline"]:
+                    writer.add([], ack=news_item["_id"])
+                continue
+
+            future = parse_pool.submit(
+                parse_news_content,
+                content,
+                {"symbol": news_item["symbol"], "datetime": news_item["datetime"]},
+                news_item["url"],
+            )
+            pending[future] = news_item
+            if len(pending) >= parse_workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    save_parse_result(
+                        future, pending.pop(future), writer, reparse_from_cache
+                    )
 
+        for future in list(pending):
+            save_parse_result(future, pending.pop(future), writer, reparse_from_cache)
+    fetch_thread.join()
+
+    logging.info(f"Saved {writer.written} entries to the database")
     logging.info("Completed fetch, process, and save of news items")
+
+
+def fetch_stage(news_items, fetched, io_workers, cache_only):
+    """
+    Fetches the content of every news item on a thread pool and puts
+    (news_item, content) pairs on the bounded fetched queue, blocking while
+    the parse stage is behind. Puts None when all items are fetched.
+    """
+    try:
+        with ThreadPoolExecutor(max_workers=io_workers) as executor:
+            for news_item, future in run_bounded(
+                executor,
+                lambda news_item: fetch_news_content(news_item, cache_only),
+                news_items,
+                max_in_flight=io_workers * 2,
+            ):
+                try:
+                    fetched.put((news_item, future.result()))
+                except Exception as e:
+                    logging.error(f"Error fetching news item {news_item['url']}: {e}")
+    except Exception as e:
+        logging.error(f"Error in fetch stage: {e}")
+    finally:
+        fetched.put(None)
+
+
+def save_parse_result(future, news_item, writer, reparse=False):
+    try:
+        reshaped_data = future.result()
+        logging.info(f"Processing symbol: {news_item['symbol']}")
+        save_to_db(
+            reshaped_data,
+            writer,
+            ack=news_item["_id"],
+            replace_url=news_item["url"] if reparse else None,
+        )
+    except Exception as e:
+        logging.error(f"Error processing news item {news_item['url']}: {e}")
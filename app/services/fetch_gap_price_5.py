@@ -7,6 +7,7 @@ from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
+from .http_fetcher import HttpFetcher
 from .utils import db
 
 # Configure logging
@@ -24,6 +25,8 @@ db = client["StockThaiAnalysis"]
 predict_collection = db["predict"]
 last_price_collection = db["last_price"]
 
+http_fetcher = HttpFetcher(pool_maxsize=1)
+
 
 def get_cookies_and_headers_with_selenium(driver, symbol):
     try:
@@ -58,7 +61,7 @@ def fetch_stock_price(symbol, headers):
     logging.info(f"Fetching stock price for {symbol} from {api_url}")
 
     try:
-        response = requests.get(api_url, headers=headers)
+        response = http_fetcher.get(api_url, headers=headers)
         if response.status_code == 200:
             data = response.json()
             try:
@@ -1,12 +1,17 @@
 from datetime import datetime, timedelta
 import logging
-from pymongo import UpdateOne
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import UpdateOne, errors
 from requests import Session
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from typing import List, Optional, Dict, Any, Union
 from dataclasses import dataclass
-from .utils import setup_session, db
+from .http_fetcher import HttpFetcher
+from .utils import setup_session, db, run_bounded
 
 # Set up logging configuration
 logging.basicConfig(
@@ -15,6 +20,9 @@ logging.basicConfig(
 )
 logging.getLogger().disabled = False
 
+NEWS_HISTORY_DAYS = 5 * 365
+NEWS_WATERMARK_OVERLAP_DAYS = 1
+
 
 @dataclass
 class NewsItem:
@@ -33,6 +41,10 @@ class NewsItem:
     viewClarification: Optional[str]
 
 
+# Callers pass either a plain session or a pooled HttpFetcher, both expose get()
+HttpClient = Union[Session, HttpFetcher]
+
+
 def setup_session_with_proxy(
     proxy_enabled: bool = False, proxy: Optional[str] = None, pool_maxsize: int = 20
 ) -> Session:
@@ -59,9 +71,11 @@ def setup_session_with_proxy(
     return session
 
 
-def get_news_for_symbol(session: Session, symbol: str) -> List[NewsItem]:
+def get_news_for_symbol(
+    session: HttpClient, symbol: str, from_date: Optional[datetime] = None
+) -> List[NewsItem]:
     toDate = datetime.now()
-    fromDate = toDate - timedelta(days=5 * 365)
+    fromDate = from_date or toDate - timedelta(days=NEWS_HISTORY_DAYS)
     url = "https://www.set.or.th/api/set/news/search"
     params = {
         "symbol": symbol,
@@ -103,38 +117,261 @@ def fetch_symbols_from_mongo() -> List[str]:
         return []
 
 
-def save_news_to_mongo(news_list: List[NewsItem]) -> None:
+class NewsUrlIndex:
+    """
+    In-memory set of news URLs already stored in MongoDB, loaded once per run
+    so that deduplication does not cost a round trip per headline.
+    """
+
+    def __init__(self, urls: Optional[List[str]] = None) -> None:
+        self._urls = set(urls or [])
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls) -> "NewsUrlIndex":
+        logging.info("Loading known news URLs from MongoDB")
+        cursor = db.news.find({}, {"url": 1, "_id": 0}).batch_size(10000)
+        index = cls(doc["url"] for doc in cursor if "url" in doc)
+        logging.info(f"Loaded {len(index)} known news URLs")
+        return index
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._urls
+
+    def claim(self, url: str) -> bool:
+        """Marks the URL as seen and returns True if it was not seen before."""
+        with self._lock:
+            if url in self._urls:
+                return False
+            self._urls.add(url)
+            return True
+
+    def release(self, urls: List[str]) -> None:
+        with self._lock:
+            self._urls.difference_update(urls)
+
+
+def ensure_news_indexes() -> None:
+    db.news_watermarks.create_index("symbol", unique=True)
+    try:
+        db.news.create_index("url", unique=True)
+    except errors.OperationFailure as e:
+        logging.error(
+            f"Could not create unique index on news.url, remove duplicate URLs first: {e}"
+        )
+
+
+def save_news_to_mongo(
+    news_list: List[NewsItem], url_index: Optional[NewsUrlIndex] = None
+) -> bool:
+    """Returns False if the news could not be written, True otherwise."""
     news_collection = db.news
     operations = []
 
     logging.info(f"Preparing to save {len(news_list)} news items to MongoDB")
 
-    for news in news_list:
-        if "(F45)" in news.headline:
-            if not news_collection.find_one({"url": news.url}):
-                operations.append(
-                    UpdateOne({"url": news.url}, {"$set": news.__dict__}, upsert=True)
-                )
-                logging.debug(f"Prepared update operation for news item: {news.url}")
+    f45_news = {news.url: news for news in news_list if "(F45)" in news.headline}
+    if url_index is not None:
+        new_urls = [url for url in f45_news if url_index.claim(url)]
+    else:
+        existing_urls = {
+            doc["url"]
+            for doc in news_collection.find(
+                {"url": {"$in": list(f45_news)}}, {"url": 1, "_id": 0}
+            )
+        }
+        new_urls = [url for url in f45_news if url not in existing_urls]
+
+    for url in new_urls:
+        operations.append(
+            UpdateOne(
+                {"url": url},
+                {"$set": f45_news[url].__dict__, "$setOnInsert": {"processed": False}},
+                upsert=True,
+            )
+        )
+        logging.debug(f"Prepared update operation for news item: {url}")
 
     if operations:
         try:
             result = news_collection.bulk_write(operations, ordered=False)
             logging.info(
-                f"Bulk write complete: Inserted/Updated {result.modified_count} documents."
+                f"Bulk write complete: Inserted/Updated {result.upserted_count + result.modified_count} documents."
             )
         except Exception as e:
             logging.error(f"Error saving news to MongoDB: {e}")
+            if url_index is not None:
+                url_index.release(new_urls)
+            return False
     else:
         logging.warning("No news items to update in MongoDB")
+    return True
+
+
+def get_news_watermark(symbol: str) -> Optional[Dict[str, Any]]:
+    try:
+        return db.news_watermarks.find_one({"symbol": symbol}, {"_id": 0})
+    except Exception as e:
+        logging.error(f"Error fetching news watermark for symbol {symbol}: {e}")
+        return None
+
+
+def get_incremental_from_date(
+    watermark: Optional[Dict[str, Any]], full_resync: bool
+) -> Optional[datetime]:
+    """
+    Returns the date to resume fetching news from, or None when the symbol
+    needs the full NEWS_HISTORY_DAYS window.
 
+    Args:
+        watermark (Optional[Dict[str, Any]]): The stored watermark document for the symbol.
+        full_resync (bool): Whether a full resync was requested for this run.
+    """
+    if full_resync or not watermark:
+        return None
+
+    last_news_datetime = watermark.get("lastNewsDatetime")
+    last_full_sync = watermark.get("lastFullSyncAt")
+    if not last_news_datetime or not last_full_sync:
+        return None
+
+    resync_days = int(os.getenv("NEWS_FULL_RESYNC_DAYS", "30"))
+    if datetime.now() - last_full_sync.replace(tzinfo=None) > timedelta(
+        days=resync_days
+    ):
+        return None
+
+    return last_news_datetime.replace(tzinfo=None) - timedelta(
+        days=NEWS_WATERMARK_OVERLAP_DAYS
+    )
 
-def fetch_and_save_news(session: Session, symbol: str) -> None:
+
+def update_news_watermark(
+    symbol: str, news_list: List[NewsItem], full_sync: bool
+) -> None:
+    news_datetimes = []
+    for news in news_list:
+        try:
+            news_datetimes.append(datetime.fromisoformat(news.datetime))
+        except (TypeError, ValueError):
+            logging.warning(f"Invalid news datetime {news.datetime} for {news.url}")
+
+    if not news_datetimes:
+        return
+
+    now = datetime.now()
+    update: Dict[str, Any] = {
+        "$max": {"lastNewsDatetime": max(news_datetimes)},
+        "$set": {"lastFetchedAt": now},
+    }
+    if full_sync:
+        update["$set"]["lastFullSyncAt"] = now
+
+    try:
+        db.news_watermarks.update_one({"symbol": symbol}, update, upsert=True)
+        logging.debug(f"Updated news watermark for symbol {symbol}")
+    except Exception as e:
+        logging.error(f"Error updating news watermark for symbol {symbol}: {e}")
+
+
+def fetch_and_save_news(
+    session: HttpClient,
+    symbol: str,
+    full_resync: bool = False,
+    url_index: Optional[NewsUrlIndex] = None,
+) -> None:
     logging.info(f"Starting news fetch and save process for symbol {symbol}")
-    news = get_news_for_symbol(session, symbol)
+    from_date = get_incremental_from_date(get_news_watermark(symbol), full_resync)
+    if from_date is None:
+        logging.info(f"Running full news sync for symbol {symbol}")
+    news = get_news_for_symbol(session, symbol, from_date=from_date)
     if news:
         logging.info(f"Saving {len(news)} news items for symbol {symbol} to MongoDB")
-        save_news_to_mongo(news)
+        if save_news_to_mongo(news, url_index):
+            update_news_watermark(symbol, news, full_sync=from_date is None)
+        else:
+            # Keep the watermark so the unsaved news is fetched again next run
+            logging.warning(f"Not advancing news watermark for symbol {symbol}")
     else:
         logging.warning(f"No news items found for symbol {symbol}")
     logging.info(f"Completed news fetch and save process for symbol {symbol}")
+
+
+def fetch_and_save_news_concurrently(
+    session: Session,
+    symbols: List[str],
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    full_resync: Optional[bool] = None,
+) -> Dict[str, float]:
+    max_workers = max_workers or int(os.getenv("NEWS_FETCH_WORKERS", "10"))
+    max_in_flight = max_in_flight or int(
+        os.getenv("NEWS_MAX_IN_FLIGHT", str(max_workers))
+    )
+    if full_resync is None:
+        full_resync = os.getenv("NEWS_FULL_RESYNC", "false").lower() in ("1", "true")
+    if full_resync:
+        logging.info("Full news resync requested for all symbols")
+    ensure_news_indexes()
+    url_index = NewsUrlIndex.load()
+    # Pooled keep-alive connections with per-host caps and backoff, shared by all workers
+    fetcher = HttpFetcher(
+        session=session, pool_maxsize=max_workers, max_per_host=max_workers
+    )
+    logging.info(
+        f"Starting concurrent news ingestion for {len(symbols)} symbols "
+        f"with {max_workers} workers and at most {max_in_flight} requests in flight"
+    )
+
+    def timed_fetch_and_save(symbol: str) -> float:
+        started = time.perf_counter()
+        fetch_and_save_news(
+            fetcher, symbol, full_resync=full_resync, url_index=url_index
+        )
+        return time.perf_counter() - started
+
+    latencies: Dict[str, float] = {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for symbol, future in run_bounded(
+            executor, timed_fetch_and_save, symbols, max_in_flight
+        ):
+            try:
+                latencies[symbol] = future.result()
+                logging.info(
+                    f"Ingested news for symbol {symbol} in {latencies[symbol]:.2f}s"
+                )
+            except Exception as e:
+                logging.error(f"Error ingesting news for symbol {symbol}: {e}")
+    elapsed = time.perf_counter() - started
+
+    log_ingestion_stats(latencies, len(symbols), elapsed)
+    return latencies
+
+
+def log_ingestion_stats(
+    latencies: Dict[str, float], total_symbols: int, elapsed: float
+) -> None:
+    if not latencies:
+        logging.warning(
+            f"No symbols ingested out of {total_symbols} in {elapsed:.2f}s"
+        )
+        return
+
+    ordered = sorted(latencies.values())
+    p50 = ordered[len(ordered) // 2]
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    slowest = sorted(latencies.items(), key=lambda item: item[1], reverse=True)[:5]
+    logging.info(
+        f"Ingested {len(latencies)}/{total_symbols} symbols in {elapsed:.2f}s "
+        f"({len(latencies) / elapsed if elapsed else 0:.2f} symbols/sec); "
+        f"per-symbol latency mean={sum(ordered) / len(ordered):.2f}s "
+        f"p50={p50:.2f}s p95={p95:.2f}s max={ordered[-1]:.2f}s"
+    )
+    logging.info(
+        "Slowest symbols: "
+        + ", ".join(f"{symbol}={latency:.2f}s" for symbol, latency in slowest)
+    )
@@ -1,16 +1,30 @@
-from pymongo import MongoClient
-from tvDatafeed.main import TvDatafeed, Interval
+from pymongo import ASCENDING, MongoClient, UpdateOne, errors
+from ..tvDatafeed.main import Interval
+from ..tvDatafeed.pool import TvDatafeedPool
+import numpy as np
 import pandas as pd
 import logging
 import time
+from collections import defaultdict
+from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import os
-from .utils import db
+from .price_history import (
+    PRICE_FIELDS,
+    PriceHistoryCache,
+    PriceSeries,
+    compute_predicted_prices,
+)
+from .price_store import PriceStore
+from .utils import BulkWriter, db, run_bounded
 
 load_dotenv()
 
-tv = TvDatafeed()
+# One TradingView connection per concurrent job 4 worker
+tv_pool = TvDatafeedPool(
+    size=int(os.getenv("TV_POOL_SIZE", os.getenv("PREDICT_WORKERS", "5")))
+)
 
 mongo_uri = os.getenv("MONGO_URI")
 client = MongoClient(mongo_uri)
@@ -20,78 +34,296 @@ cache_collection = client2["StockThaiAnalysis"]["HistoricalDataCache"]
 processed_collection = db["processed"]
 predict_collection = db["predict"]
 
+# Decoded, date-indexed price series shared by all job 4 workers
+price_cache = PriceHistoryCache(
+    int(os.getenv("PRICE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+)
+# Memory-mapped series shared by all job 4 processes on this host
+price_store = PriceStore()
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(module)s - %(funcName)s - %(message)s",
 )
 
 
-def get_price_on_date(symbol, date, retries=3, backoff_factor=2):
-    logging.info(f"Fetching price for {symbol} on {date.date()}")
-    cached_data = cache_collection.find_one({"symbol": symbol})
+FULL_HISTORY_BARS = 5000
+# Bars refetched before the last cached one to detect split adjustments
+PRICE_REFRESH_OVERLAP_BARS = int(os.getenv("PRICE_REFRESH_OVERLAP_BARS", "5"))
+PRICE_CACHE_TTL_HOURS = float(os.getenv("PRICE_CACHE_TTL_HOURS", "12"))
+# F45s published on weekends and holidays resolve to the nearest trading day
+PRICE_AS_OF_MODE = os.getenv("PRICE_AS_OF_MODE", "previous_close")
+PRICE_AS_OF_MAX_GAP_DAYS = int(os.getenv("PRICE_AS_OF_MAX_GAP_DAYS", "7"))
+# Page further back than FULL_HISTORY_BARS until this date, e.g. 2000-01-01
+PRICE_HISTORY_START = os.getenv("PRICE_HISTORY_START")
 
-    if cached_data:
-        logging.info(f"Using cached data for {symbol}")
-        data = pd.DataFrame(cached_data["data"])
-        data["datetime"] = pd.to_datetime(data["datetime"])
-    else:
-        logging.info(f"No cache available, fetching from TV API for {symbol}")
-        attempt = 0
-        while attempt < retries:
-            try:
-                data = tv.get_hist(
-                    symbol=symbol,
-                    exchange="SET",
-                    interval=Interval.in_daily,
-                    n_bars=5000,
+
+def fetch_history_frame(symbol, n_bars, retries=3, backoff_factor=2):
+    attempt = 0
+    while attempt < retries:
+        try:
+            data = tv_pool.get_hist(
+                symbol=symbol,
+                exchange="SET",
+                interval=Interval.in_daily,
+                n_bars=n_bars,
+            )
+            if data is None or data.empty:
+                logging.error(
+                    f"No data returned for {symbol} on exchange 'SET'. Please check the symbol and exchange."
                 )
-                if data is None or data.empty:
-                    logging.error(
-                        f"No data returned for {symbol} on exchange 'SET'. Please check the symbol and exchange."
-                    )
-                    return None
-                data["datetime"] = data.index
-                data_for_mongo = data.reset_index(drop=True)
-                data_for_mongo["datetime"] = data_for_mongo["datetime"].astype(str)
-                cache_collection.insert_one(
-                    {"symbol": symbol, "data": data_for_mongo.to_dict("list")}
+                return None
+            return data
+        except Exception as e:
+            if "429" in str(e):
+                attempt += 1
+                sleep_time = backoff_factor**attempt
+                logging.warning(
+                    f"Rate limit reached. Retrying in {sleep_time} seconds..."
                 )
-                logging.info(f"Data fetched and cached for {symbol}")
-                break
-            except Exception as e:
-                if "429" in str(e):
-                    attempt += 1
-                    sleep_time = backoff_factor**attempt
-                    logging.warning(
-                        f"Rate limit reached. Retrying in {sleep_time} seconds..."
-                    )
-                    time.sleep(sleep_time)
-                elif "Connection to remote host was lost" in str(e):
-                    attempt += 1
-                    sleep_time = backoff_factor**attempt
-                    logging.warning(
-                        f"Connection lost. Retrying in {sleep_time} seconds..."
-                    )
-                    time.sleep(sleep_time)
-                else:
-                    logging.error(f"Error fetching data for {symbol}: {e}")
-                    return None
-
-    data_filtered = data[data["datetime"].dt.date == date.date()]
-    if not data_filtered.empty:
+                time.sleep(sleep_time)
+            elif "Connection to remote host was lost" in str(e):
+                attempt += 1
+                sleep_time = backoff_factor**attempt
+                logging.warning(f"Connection lost. Retrying in {sleep_time} seconds...")
+                time.sleep(sleep_time)
+            else:
+                logging.error(f"Error fetching data for {symbol}: {e}")
+                return None
+    return None
+
+
+def save_price_history(series):
+    cache_collection.update_one(
+        {"symbol": series.symbol},
+        {"$set": {**series.to_document(), "lastRefreshedAt": datetime.now()}},
+        upsert=True,
+    )
+
+
+def fetch_deep_price_history(symbol, start):
+    """
+    Pages through the daily history of a symbol back to start. Each page
+    frame is decoded into arrays as it arrives and then dropped, so only the
+    compact arrays accumulate until the pages are joined.
+
+    Returns None if paging fails partway, since an incomplete history saved
+    as fresh would never have its older bars fetched again.
+    """
+    pages = []
+    try:
+        for page in tv_pool.get_hist_pages(
+            symbol=symbol,
+            exchange="SET",
+            interval=Interval.in_daily,
+            page_bars=FULL_HISTORY_BARS,
+            start=start,
+        ):
+            pages.append(PriceSeries.from_frame(symbol, page))
+    except Exception as e:
+        logging.error(
+            f"Error paging history for {symbol} after {len(pages)} pages: {e}"
+        )
+        return None
+    if not pages:
+        return None
+
+    pages.reverse()
+    return PriceSeries(
+        symbol,
+        np.concatenate([page.timestamps for page in pages]),
+        **{
+            field: np.concatenate([getattr(page, field) for page in pages])
+            for field in PRICE_FIELDS
+        },
+    )
+
+
+def fetch_full_price_history(symbol, retries=3, backoff_factor=2):
+    if PRICE_HISTORY_START:
+        series = fetch_deep_price_history(symbol, PRICE_HISTORY_START)
+    else:
+        data = fetch_history_frame(symbol, FULL_HISTORY_BARS, retries, backoff_factor)
+        series = PriceSeries.from_frame(symbol, data) if data is not None else None
+    if series is None:
+        return None
+    save_price_history(series)
+    logging.info(f"Data fetched and cached for {symbol}")
+    return series
+
+
+def is_cache_fresh(cached_data):
+    refreshed_at = cached_data.get("lastRefreshedAt")
+    return refreshed_at is not None and datetime.now() - refreshed_at < timedelta(
+        hours=PRICE_CACHE_TTL_HOURS
+    )
+
+
+def refresh_price_history(series, retries=3, backoff_factor=2):
+    symbol = series.symbol
+    last_day = series.days[-1].astype(datetime)
+    # Calendar days bound the number of trading bars missed since the last one
+    n_bars = min(
+        (datetime.now().date() - last_day).days + PRICE_REFRESH_OVERLAP_BARS,
+        FULL_HISTORY_BARS,
+    )
+    data = fetch_history_frame(symbol, n_bars, retries, backoff_factor)
+    if data is None:
+        logging.warning(f"Could not refresh {symbol}, using cached data")
+        return series
+
+    merged = series.merge(PriceSeries.from_frame(symbol, data))
+    if merged is None:
+        logging.warning(
+            f"Cached bars for {symbol} disagree with TradingView, refetching full history"
+        )
+        return fetch_full_price_history(symbol, retries, backoff_factor) or series
+
+    save_price_history(merged)
+    logging.info(
+        f"Refreshed {symbol} with {len(merged) - len(series)} new bars "
+        f"from {n_bars} fetched"
+    )
+    return merged
+
+
+def prefetch_price_histories(symbols):
+    # Symbols never cached are pulled in one pass over a few multiplexed
+    # connections instead of one connection per symbol
+    cached = {
+        document["symbol"]
+        for document in cache_collection.find(
+            {"symbol": {"$in": list(symbols)}}, {"symbol": 1, "_id": 0}
+        )
+    }
+    missing = [symbol for symbol in symbols if symbol not in cached]
+    if not missing:
+        return
+    if PRICE_HISTORY_START:
+        # Deep histories are paged per symbol by fetch_full_price_history,
+        # a single 5000-bar prefetch would be cached as fresh in their place
+        logging.info(
+            f"Skipping prefetch of {len(missing)} uncached symbols, paging their "
+            f"history back to {PRICE_HISTORY_START}"
+        )
+        return
+
+    logging.info(f"Prefetching price history for {len(missing)} uncached symbols")
+    fetched = 0
+    for symbol, data in tv_pool.get_hist_many(
+        missing, exchange="SET", interval=Interval.in_daily, n_bars=FULL_HISTORY_BARS
+    ):
+        if data is None or data.empty:
+            logging.warning(f"No data prefetched for {symbol}")
+            continue
+        save_price_history(PriceSeries.from_frame(symbol, data))
+        fetched += 1
+    logging.info(f"Prefetched price history for {fetched} of {len(missing)} symbols")
+
+
+def load_price_history(symbol, retries=3, backoff_factor=2):
+    cached_data = cache_collection.find_one({"symbol": symbol})
+
+    if cached_data:
+        series = PriceSeries.from_document(cached_data)
+        if is_cache_fresh(cached_data) or len(series) == 0:
+            logging.info(f"Using cached data for {symbol}")
+            return series
+        return refresh_price_history(series, retries, backoff_factor)
+
+    logging.info(f"No cache available, fetching from TV API for {symbol}")
+    return fetch_full_price_history(symbol, retries, backoff_factor)
+
+
+def get_price_history(symbol, retries=3, backoff_factor=2):
+    series = price_cache.get(symbol)
+    if series is not None:
+        return series
+
+    series = price_store.get(symbol, max_age=PRICE_CACHE_TTL_HOURS * 3600)
+    if series is None:
+        series = load_price_history(symbol, retries, backoff_factor)
+        if series is None:
+            return None
+        price_store.put(series)
+        # Keep the shared map rather than this process' private copy
+        series = price_store.get(symbol) or series
+    price_cache.put(symbol, series)
+    return series
+
+
+def get_price_on_date(symbol, date, retries=3, backoff_factor=2):
+    logging.info(f"Fetching price for {symbol} on {date.date()}")
+    series = get_price_history(symbol, retries, backoff_factor)
+    if series is None:
+        return None
+
+    close_price = series.price_as_of(
+        date, mode=PRICE_AS_OF_MODE, max_gap_days=PRICE_AS_OF_MAX_GAP_DAYS
+    )
+    if close_price is not None:
         logging.info(f"Price found for {symbol} on {date.date()}")
-        return data_filtered.iloc[-1]["close"]
+        return close_price
     else:
         logging.warning(f"No trading data available for {symbol} on {date.date()}")
         return None
 
 
-def process_entry(entry):
+PREDICT_FIELDS = ["Symbol", "Year", "Quarter", "Url", "EPS", "Datetime"]
+PREDICT_KEY = ["Symbol", "Year", "Quarter", "Datetime"]
+
+
+def remove_duplicate_predictions():
+    duplicates = predict_collection.aggregate(
+        [
+            {
+                "$group": {
+                    "_id": {field: f"${field}" for field in PREDICT_KEY},
+                    "ids": {"$push": "$_id"},
+                    "count": {"$sum": 1},
+                }
+            },
+            {"$match": {"count": {"$gt": 1}}},
+        ],
+        allowDiskUse=True,
+    )
+    # Keep the first prediction of every key
+    duplicate_ids = [_id for group in duplicates for _id in group["ids"][1:]]
+    if duplicate_ids:
+        result = predict_collection.delete_many({"_id": {"$in": duplicate_ids}})
+        logging.info(f"Removed {result.deleted_count} duplicate predictions")
+
+
+def ensure_predict_indexes():
+    keys = [(field, ASCENDING) for field in PREDICT_KEY]
+    try:
+        predict_collection.create_index(keys, unique=True, name="predict_key")
+    except errors.OperationFailure as e:
+        logging.warning(f"Removing duplicates before indexing predictions: {e}")
+        remove_duplicate_predictions()
+        predict_collection.create_index(keys, unique=True, name="predict_key")
+    logging.info("Ensured unique index on the predict collection")
+
+
+def predict_upsert(predict_entry):
+    return UpdateOne(
+        {field: predict_entry[field] for field in PREDICT_KEY},
+        {"$set": predict_entry},
+        upsert=True,
+    )
+
+
+def process_entry(entry, writer, series=None):
     symbol = entry["Symbol"]
     date = entry["Datetime"]
     logging.info(f"Processing entry for {symbol} on {date}")
 
-    close_price = get_price_on_date(symbol, date)
+    if series is not None:
+        close_price = series.price_as_of(
+            date, mode=PRICE_AS_OF_MODE, max_gap_days=PRICE_AS_OF_MAX_GAP_DAYS
+        )
+    else:
+        close_price = get_price_on_date(symbol, date)
 
     if close_price is not None:
         previous_eps = entry.get("EPS", 0)
@@ -120,46 +352,129 @@ def process_entry(entry):
             "PredictPrice": round(predict_price, 2),
         }
 
-        # Check for duplicate before inserting
-        existing_entry = predict_collection.find_one(
-            {
-                "Symbol": symbol,
-                "Year": entry["Year"],
-                "Quarter": entry["Quarter"],
-                "Datetime": date,
-            }
-        )
-
-        if not existing_entry:
-            try:
-                predict_collection.insert_one(predict_entry)
-                logging.info(f"Inserted predicted price for {symbol} on {date}")
-            except Exception as e:
-                logging.error(
-                    f"Error inserting predicted price for {symbol} on {date}: {e}"
-                )
-        else:
-            logging.info(f"Predicted price for {symbol} on {date} already exists")
+        writer.add([predict_upsert(predict_entry)])
+        logging.debug(f"Queued predicted price for {symbol} on {date}")
     else:
         logging.warning(
             f"Close price not found for {symbol} on {date}. Skipping entry."
         )
 
 
-def calculate_and_save_predicted_prices():
+def process_symbol_entries(symbol, entries, writer):
+    # Only this worker touches the symbol, so its history is fetched or
+    # loaded exactly once and never raced by another entry
+    series = get_price_history(symbol)
+    if series is None:
+        logging.warning(
+            f"No price history for {symbol}. Skipping {len(entries)} entries."
+        )
+        return
+    for entry in entries:
+        process_entry(entry, writer, series)
+
+
+def calculate_predicted_prices_batch(max_workers, batch_size=1000):
+    entries = pd.DataFrame(
+        list(
+            processed_collection.find(
+                {}, {"_id": 0, **{field: 1 for field in PREDICT_FIELDS}}
+            )
+        ),
+        columns=PREDICT_FIELDS,
+    )
+    if entries.empty:
+        logging.info("No processed entries to predict")
+        return
+
+    groups = entries.groupby("Symbol")
+    symbols = list(groups.groups)
+    prefetch_price_histories(symbols)
+    logging.info(
+        f"Predicting {len(entries)} entries for {len(symbols)} symbols "
+        f"on {max_workers} workers"
+    )
+
+    # One symbol's series at a time, taken from price_cache, so that the run
+    # stays within its memory budget however many symbols there are
+    predicted = 0
+    writer = BulkWriter(predict_collection, batch_size=batch_size)
+    with writer, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for symbol, future in run_bounded(
+            executor, get_price_history, symbols, max_workers
+        ):
+            try:
+                series = future.result()
+            except Exception as e:
+                logging.error(f"Error loading price history for {symbol}: {e}")
+                continue
+            if series is None:
+                continue
+
+            predictions = compute_predicted_prices(
+                groups.get_group(symbol),
+                {symbol: series},
+                mode=PRICE_AS_OF_MODE,
+                max_gap_days=PRICE_AS_OF_MAX_GAP_DAYS,
+            )
+            predicted += len(predictions)
+            writer.add(
+                [
+                    predict_upsert(record)
+                    for record in predictions[
+                        PREDICT_FIELDS + ["ClosePrice", "PredictPrice"]
+                    ].to_dict("records")
+                ]
+            )
+
+    logging.info(
+        f"Computed {predicted} predicted prices, skipped "
+        f"{len(entries) - predicted} entries without a "
+        f"{PRICE_AS_OF_MODE} price or EPS"
+    )
+
+
+def calculate_and_save_predicted_prices(max_workers=None, batch=None):
+    max_workers = max_workers or int(os.getenv("PREDICT_WORKERS", "5"))
+    if batch is None:
+        batch = os.getenv("PREDICT_BATCH", "true").lower() in ("1", "true")
     logging.info("Starting calculation of predicted prices")
-    processed_data = list(processed_collection.find())
+    ensure_predict_indexes()
+
+    try:
+        if batch:
+            calculate_predicted_prices_batch(max_workers)
+        else:
+            calculate_predicted_prices_per_entry(max_workers)
+    finally:
+        tv_pool.close()
+    logging.info("Finished calculating and saving predicted prices")
 
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = [executor.submit(process_entry, entry) for entry in processed_data]
+
+def calculate_predicted_prices_per_entry(max_workers):
+    entries_by_symbol = defaultdict(list)
+    for entry in processed_collection.find():
+        entries_by_symbol[entry["Symbol"]].append(entry)
+    logging.info(
+        f"Scheduling {sum(map(len, entries_by_symbol.values()))} entries "
+        f"for {len(entries_by_symbol)} symbols on {max_workers} workers"
+    )
+
+    with BulkWriter(predict_collection) as writer, ThreadPoolExecutor(
+        max_workers=max_workers
+    ) as executor:
+        # Largest symbols first so that one long symbol does not finish last
+        futures = {
+            executor.submit(process_symbol_entries, symbol, entries, writer): symbol
+            for symbol, entries in sorted(
+                entries_by_symbol.items(), key=lambda item: len(item[1]), reverse=True
+            )
+        }
 
         for future in as_completed(futures):
             try:
                 future.result()
             except Exception as e:
-                logging.error(f"Error processing entry: {e}")
-
-    logging.info("Finished calculating and saving predicted prices")
+                logging.error(f"Error processing entries for {futures[future]}: {e}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(module)s - %(funcName)s - %(message)s",
+)
+logging.getLogger().disabled = False
+
+
+class HtmlCache:
+    """Gzipped on-disk cache of fetched announcement pages, keyed by URL"""
+
+    def __init__(self, root: Optional[str] = None) -> None:
+        self.root = root or os.getenv("F45_HTML_CACHE_DIR", ".cache/f45_html")
+
+    @staticmethod
+    def url_key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def path_for(self, url: str) -> str:
+        key = self.url_key(url)
+        return os.path.join(self.root, key[:2], f"{key}.json.gz")
+
+    def get_entry(self, url: str) -> Optional[Dict[str, Any]]:
+        path = self.path_for(url)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding unreadable cache entry for URL: {url} - {e}")
+            return None
+
+        if entry.get("url") != url or entry.get("contentHash") != self.content_hash(
+            entry.get("content", "")
+        ):
+            logging.warning(f"Discarding corrupted cache entry for URL: {url}")
+            return None
+        return entry
+
+    def get(self, url: str) -> Optional[str]:
+        entry = self.get_entry(url)
+        return entry["content"] if entry else None
+
+    def put(self, url: str, content: str) -> None:
+        path = self.path_for(url)
+        entry = {
+            "url": url,
+            "fetchedAt": datetime.now().isoformat(),
+            "contentHash": self.content_hash(content),
+            "content": content,
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+            logging.debug(f"Cached content for URL: {url}")
+        except OSError as e:
+            logging.error(f"Error caching content for URL: {url} - {e}")
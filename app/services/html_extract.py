@@ -0,0 +1,199 @@
+import logging
+import os
+import re
+from bs4 import BeautifulSoup
+from bs4.dammit import EntitySubstitution
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(module)s - %(funcName)s - %(message)s",
+)
+logging.getLogger().disabled = False
+
+CONTENT_SELECTOR = "raw-html"
+NOT_FOUND_TEXT = "N/A"
+
+_TAG_BODY = r"""(?:[^>"']|"[^"]*"|'[^']*')*"""
+_DIV_START_RE = re.compile(r"<div(?=[\s/>])(" + _TAG_BODY + r")>", re.IGNORECASE)
+_ATTR_RE = re.compile(r"""([^\s/>"'=]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'>]+))?""")
+_TAG_RE = re.compile(r"<(/?)([a-zA-Z][^\s/>]*)" + _TAG_BODY + r">")
+_MARKUP_START_RE = re.compile(r"<[!?/a-zA-Z]")
+_ENTITY_RE = re.compile(r"&(?:#([0-9]+|[xX][0-9a-fA-F]+)|([a-zA-Z][a-zA-Z0-9]*));")
+# Elements whose content html.parser does not treat as plain text
+_RAW_TEXT_TAGS = {
+    "script",
+    "style",
+    "textarea",
+    "title",
+    "xmp",
+    "iframe",
+    "noembed",
+    "noframes",
+    "noscript",
+    "plaintext",
+}
+
+# Elements html.parser never leaves open, so they take no close tag
+_VOID_TAGS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "param",
+    "source",
+    "track",
+    "wbr",
+}
+
+
+class FastPathUnsupported(Exception):
+    """Raised when the fast path cannot guarantee the same text as BeautifulSoup."""
+
+
+def extract_with_bs4(content):
+    soup = BeautifulSoup(content, "html.parser")
+    content_block = soup.find("div", {"class": CONTENT_SELECTOR})
+    return content_block.text if content_block else NOT_FOUND_TEXT
+
+
+def _has_class(attrs):
+    values = [
+        value.strip("\"'")
+        for name, value in _ATTR_RE.findall(attrs)
+        if name.lower() == "class"
+    ]
+    if len(values) > 1:
+        raise FastPathUnsupported("duplicate class attribute")
+    if not values:
+        return False
+    if "&" in values[0]:
+        raise FastPathUnsupported("character reference in class attribute")
+    return CONTENT_SELECTOR in values[0].split()
+
+
+def _inside_raw_text(content, pos):
+    head = content[:pos].lower()
+    for opener, closer in (
+        ("<!--", "-->"),
+        ("<![cdata[", "]]>"),
+        ("<script", "</script"),
+        ("<style", "</style"),
+        ("<textarea", "</textarea"),
+        ("<title", "</title"),
+    ):
+        start = head.rfind(opener)
+        if start != -1 and head.find(closer, start + len(opener)) == -1:
+            return True
+    return False
+
+
+def _find_block(content):
+    for match in _DIV_START_RE.finditer(content):
+        if not _has_class(match.group(1)):
+            continue
+        if _inside_raw_text(content, match.start()):
+            raise FastPathUnsupported("content block inside comment or script")
+        if match.group(0).endswith("/>"):
+            return match.end(), match.end()
+
+        # BeautifulSoup closes every element opened after the one a close tag
+        # names, so only cleanly nested markup gives the same block
+        open_tags = ["div"]
+        for tag in _TAG_RE.finditer(content, match.end()):
+            name = tag.group(2).lower()
+            if name in _RAW_TEXT_TAGS:
+                raise FastPathUnsupported(f"<{name}> inside content block")
+            if tag.group(1):
+                if name != open_tags[-1]:
+                    raise FastPathUnsupported(
+                        f"</{name}> does not close <{open_tags[-1]}>"
+                    )
+                open_tags.pop()
+                if not open_tags:
+                    return match.end(), tag.start()
+            elif name not in _VOID_TAGS and not tag.group(0).endswith("/>"):
+                open_tags.append(name)
+        raise FastPathUnsupported("unclosed content block")
+    return None
+
+
+def _replace_entity(match):
+    number, name = match.groups()
+    if name is not None:
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        return character if character is not None else "&" + name
+
+    code = int(number[1:], 16) if number[0] in "xX" else int(number)
+    data = None
+    if code < 256:
+        try:
+            data = bytearray([code]).decode("windows-1252")
+        except UnicodeDecodeError:
+            pass
+    if not data:
+        try:
+            data = chr(code)
+        except (ValueError, OverflowError):
+            pass
+    return data or "\N{REPLACEMENT CHARACTER}"
+
+
+def _block_text(block):
+    pieces = []
+    pos = 0
+    for markup in _MARKUP_START_RE.finditer(block):
+        start = markup.start()
+        if start < pos:
+            continue
+        tag = _TAG_RE.match(block, start)
+        if tag is None:
+            raise FastPathUnsupported("comment, declaration or malformed tag")
+        pieces.append(block[pos:start])
+        pos = tag.end()
+    pieces.append(block[pos:])
+    text = "".join(pieces)
+
+    if "&" in text:
+        if text.count("&") != len(_ENTITY_RE.findall(text)):
+            raise FastPathUnsupported("ambiguous character reference")
+        text = _ENTITY_RE.sub(_replace_entity, text)
+    return text
+
+
+def extract_fast(content):
+    """
+    Returns the text of the first div with the raw-html class without
+    building a DOM, matching what BeautifulSoup's html.parser would return.
+    Raises FastPathUnsupported for markup it cannot handle identically.
+    """
+    if CONTENT_SELECTOR not in content:
+        return NOT_FOUND_TEXT
+    span = _find_block(content)
+    if span is None:
+        raise FastPathUnsupported("content block not recognised")
+    return _block_text(content[span[0] : span[1]])
+
+
+def extract_with_fallback(content):
+    try:
+        return extract_fast(content)
+    except FastPathUnsupported as e:
+        logging.debug(f"Falling back to BeautifulSoup extraction: {e}")
+        return extract_with_bs4(content)
+
+
+EXTRACTION_BACKENDS = {
+    "fast": extract_with_fallback,
+    "bs4": extract_with_bs4,
+}
+
+
+def extract_content_text(content, backend=None):
+    backend = backend or os.getenv("HTML_EXTRACT_BACKEND", "fast")
+    return EXTRACTION_BACKENDS[backend](content)
@@ -0,0 +1,119 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+import requests
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(module)s - %(funcName)s - %(message)s",
+)
+logging.getLogger().disabled = False
+
+
+class HttpFetcher:
+    """Thread-safe, pooled HTTP client usable wherever a requests session is"""
+
+    def __init__(
+        self,
+        session: Optional[Session] = None,
+        pool_maxsize: Optional[int] = None,
+        max_per_host: Optional[int] = None,
+        retries: Optional[int] = None,
+        backoff_factor: float = 0.5,
+        timeout: Optional[Tuple[float, float]] = None,
+        retry_statuses: Iterable[int] = (429, 500, 502, 503, 504),
+    ) -> None:
+        self.pool_maxsize = pool_maxsize or int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+        self.max_per_host = max_per_host or int(
+            os.getenv("HTTP_MAX_PER_HOST", str(self.pool_maxsize))
+        )
+        self.retries = (
+            retries if retries is not None else int(os.getenv("HTTP_RETRIES", "3"))
+        )
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout or (
+            float(os.getenv("HTTP_CONNECT_TIMEOUT", "10")),
+            float(os.getenv("HTTP_READ_TIMEOUT", "60")),
+        )
+        self.retry_statuses = set(retry_statuses)
+
+        self.session = session or requests.Session()
+        # Keep the connect/read retries of a session set up by the caller, e.g.
+        # by setup_session_with_proxy, but retry statuses only in get() so
+        # that a failing URL is not retried by two layers
+        max_retries = 0
+        retry = self.session.get_adapter("https://").max_retries if session else None
+        if isinstance(retry, Retry):
+            max_retries = retry.new(
+                status=0, status_forcelist=None, respect_retry_after_header=False
+            )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_maxsize,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=max_retries,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    def _backoff(self, attempt: int, response: Optional[Response] = None) -> float:
+        retry_after = (
+            response.headers.get("Retry-After") if response is not None else None
+        )
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_factor * 2**attempt + random.uniform(0, self.backoff_factor)
+
+    def get(self, url: str, **kwargs) -> Response:
+        kwargs.setdefault("timeout", self.timeout)
+        host_limit = self._host_limit(url)
+
+        for attempt in range(self.retries + 1):
+            try:
+                with host_limit:
+                    response = self.session.get(url, **kwargs)
+            except requests.RequestException as e:
+                if attempt == self.retries:
+                    raise
+                delay = self._backoff(attempt)
+                logging.warning(
+                    f"Error fetching URL: {url} on attempt {attempt + 1} - {e}, "
+                    f"retrying in {delay:.1f}s"
+                )
+            else:
+                if (
+                    response.status_code not in self.retry_statuses
+                    or attempt == self.retries
+                ):
+                    return response
+                delay = self._backoff(attempt, response)
+                logging.warning(
+                    f"Status code {response.status_code} fetching URL: {url} on "
+                    f"attempt {attempt + 1}, retrying in {delay:.1f}s"
+                )
+            time.sleep(delay)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "HttpFetcher":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
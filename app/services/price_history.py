@@ -0,0 +1,280 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(module)s - %(funcName)s - %(message)s",
+)
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+# How a date is resolved to a price: the close on that exact day, the close
+# of the last bar on or before it, or the open/close of the first bar after it
+PRICE_AS_OF_MODES = ("exact", "previous_close", "next_open", "next_close")
+# Version 1 is the legacy list-per-column layout with string datetimes
+PRICE_SCHEMA_VERSION = 2
+# Fixed-width record layout of the local price store
+PRICE_RECORD_DTYPE = np.dtype(
+    [("timestamp", "<M8[ns]"), ("day", "<M8[D]")]
+    + [(field, "<f8") for field in PRICE_FIELDS]
+)
+
+
+class PriceSeries:
+    """
+    Price bars of one symbol decoded once into NumPy arrays sorted by time,
+    so that lookups by date are binary searches instead of frame scans.
+    """
+
+    def __init__(
+        self, symbol: str, timestamps: np.ndarray, **columns: np.ndarray
+    ) -> None:
+        order = np.argsort(timestamps, kind="stable")
+        if not np.all(order == np.arange(len(order))):
+            timestamps = timestamps[order]
+            columns = {name: values[order] for name, values in columns.items()}
+
+        self.symbol = symbol
+        self.timestamps = timestamps.astype("datetime64[ns]", copy=False)
+        self.days = self.timestamps.astype("datetime64[D]")
+        for field in PRICE_FIELDS:
+            setattr(
+                self,
+                field,
+                np.asarray(
+                    columns.get(field, np.zeros(len(timestamps))), dtype=np.float64
+                ),
+            )
+
+    @classmethod
+    def from_frame(cls, symbol: str, frame: pd.DataFrame) -> "PriceSeries":
+        timestamps = (
+            frame["datetime"]
+            if "datetime" in frame.columns
+            else frame.index.to_series()
+        )
+        return cls(
+            symbol,
+            pd.to_datetime(timestamps).to_numpy(dtype="datetime64[ns]"),
+            **{
+                field: frame[field].to_numpy(dtype=np.float64)
+                for field in PRICE_FIELDS
+                if field in frame.columns
+            },
+        )
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> "PriceSeries":
+        data = document["data"]
+        if document.get("schemaVersion", 1) == 1:
+            return cls.from_frame(document["symbol"], pd.DataFrame(data))
+
+        # Columns are little-endian binary blobs decoded without copying
+        return cls(
+            document["symbol"],
+            np.frombuffer(data["epochNs"], dtype="<i8").view("datetime64[ns]"),
+            **{
+                field: np.frombuffer(data[field], dtype="<f8") for field in PRICE_FIELDS
+            },
+        )
+
+    @classmethod
+    def from_records(cls, symbol: str, records: np.ndarray) -> "PriceSeries":
+        """
+        Wraps time-sorted PRICE_RECORD_DTYPE records without copying them, so
+        a read-only memory map stays shared with other processes.
+        """
+        series = cls.__new__(cls)
+        series.symbol = symbol
+        series.timestamps = records["timestamp"]
+        series.days = records["day"]
+        for field in PRICE_FIELDS:
+            setattr(series, field, records[field])
+        return series
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.timestamps.nbytes
+            + self.days.nbytes
+            + sum(getattr(self, field).nbytes for field in PRICE_FIELDS)
+        )
+
+    def close_on(self, date: datetime) -> Optional[float]:
+        """Returns the close of the last bar on the given calendar day, if any."""
+        day = np.datetime64(date.date(), "D")
+        index = np.searchsorted(self.days, day, side="right") - 1
+        if index >= 0 and self.days[index] == day:
+            return float(self.close[index])
+        return None
+
+    def to_document(self) -> Dict[str, Any]:
+        """Returns the binary columnar document stored in HistoricalDataCache."""
+        data = {"epochNs": self.timestamps.view("<i8").tobytes()}
+        for field in PRICE_FIELDS:
+            data[field] = getattr(self, field).astype("<f8", copy=False).tobytes()
+        return {
+            "symbol": self.symbol,
+            "schemaVersion": PRICE_SCHEMA_VERSION,
+            "length": len(self),
+            "data": data,
+        }
+
+    def to_records(self) -> np.ndarray:
+        records = np.empty(len(self), dtype=PRICE_RECORD_DTYPE)
+        records["timestamp"] = self.timestamps
+        records["day"] = self.days
+        for field in PRICE_FIELDS:
+            records[field] = getattr(self, field)
+        return records
+
+    def merge(
+        self, recent: "PriceSeries", rtol: float = 1e-4
+    ) -> Optional["PriceSeries"]:
+        """Replaces the tail with recent bars, None if the two need a refetch"""
+        if len(recent) == 0:
+            return self
+        # The last cached bar may have been a partial intraday bar
+        _, mine, theirs = np.intersect1d(
+            self.timestamps[:-1], recent.timestamps, return_indices=True
+        )
+        if len(mine) == 0 or not np.allclose(
+            self.close[mine], recent.close[theirs], rtol=rtol
+        ):
+            return None
+
+        keep = self.timestamps < recent.timestamps[0]
+        return PriceSeries(
+            self.symbol,
+            np.concatenate([self.timestamps[keep], recent.timestamps]),
+            **{
+                field: np.concatenate(
+                    [getattr(self, field)[keep], getattr(recent, field)]
+                )
+                for field in PRICE_FIELDS
+            },
+        )
+
+    def close_on_many(self, days: np.ndarray) -> np.ndarray:
+        """Vectorized close_on; days without a bar map to NaN."""
+        return self.price_as_of_many(days, "exact")
+
+    def price_as_of_many(
+        self,
+        days: np.ndarray,
+        mode: str = "previous_close",
+        max_gap_days: Optional[int] = None,
+    ) -> np.ndarray:
+        """Resolves calendar days to prices, NaN where none resolves"""
+        if mode not in PRICE_AS_OF_MODES:
+            raise ValueError(f"Unknown price as-of mode: {mode}")
+
+        days = np.asarray(days, dtype="datetime64[D]")
+        if mode in ("exact", "previous_close"):
+            index = np.searchsorted(self.days, days, side="right") - 1
+            found = index >= 0
+        else:
+            index = np.searchsorted(self.days, days, side="right")
+            found = index < len(self)
+
+        gaps = np.abs(self.days[index[found]] - days[found]).astype(np.int64)
+        if mode == "exact":
+            found[found] = gaps == 0
+        elif max_gap_days is not None:
+            found[found] = gaps <= max_gap_days
+
+        values = self.open if mode == "next_open" else self.close
+        prices = np.full(len(days), np.nan)
+        prices[found] = values[index[found]]
+        return prices
+
+    def price_as_of(
+        self,
+        date: datetime,
+        mode: str = "previous_close",
+        max_gap_days: Optional[int] = None,
+    ) -> Optional[float]:
+        price = self.price_as_of_many([date.date()], mode, max_gap_days)[0]
+        return None if np.isnan(price) else float(price)
+
+
+def compute_predicted_prices(
+    entries: pd.DataFrame,
+    series_by_symbol: Dict[str, PriceSeries],
+    mode: str = "previous_close",
+    max_gap_days: Optional[int] = None,
+) -> pd.DataFrame:
+    """ClosePrice and PredictPrice of the entries that have a price and EPS"""
+    frame = entries.reset_index(drop=True)
+    dates = pd.to_datetime(frame["Datetime"])
+    if dates.dt.tz is not None:
+        # Keep the wall-clock day, as datetime.date() does
+        dates = dates.dt.tz_localize(None)
+    days = dates.to_numpy(dtype="datetime64[D]")
+
+    close = np.full(len(frame), np.nan)
+    for symbol, positions in frame.groupby("Symbol").indices.items():
+        series = series_by_symbol.get(symbol)
+        if series is not None:
+            close[positions] = series.price_as_of_many(
+                days[positions], mode, max_gap_days
+            )
+
+    eps = pd.to_numeric(frame["EPS"], errors="coerce").fillna(0).to_numpy(np.float64)
+    sum_eps = eps + eps
+    valid = ~np.isnan(close) & (sum_eps != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        predict = close + eps * (close / sum_eps)
+
+    frame["ClosePrice"] = np.round(close, 2)
+    frame["PredictPrice"] = np.round(predict, 2)
+    return frame[valid].reset_index(drop=True)
+
+
+class PriceHistoryCache:
+    """Thread-safe LRU of PriceSeries bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._series: "OrderedDict[str, PriceSeries]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._series
+
+    def get(self, symbol: str) -> Optional[PriceSeries]:
+        with self._lock:
+            series = self._series.get(symbol)
+            if series is not None:
+                self._series.move_to_end(symbol)
+            return series
+
+    def put(self, symbol: str, series: PriceSeries) -> None:
+        with self._lock:
+            previous = self._series.pop(symbol, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._series[symbol] = series
+            self.nbytes += series.nbytes
+
+            while self.nbytes > self.max_bytes and len(self._series) > 1:
+                evicted_symbol, evicted = self._series.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                logging.debug(f"Evicted price history for {evicted_symbol}")
+
+    def discard(self, symbol: str) -> None:
+        with self._lock:
+            series = self._series.pop(symbol, None)
+            if series is not None:
+                self.nbytes -= series.nbytes
@@ -0,0 +1,79 @@
+import logging
+import os
+import threading
+import time
+from typing import Optional
+import numpy as np
+from .price_history import PRICE_RECORD_DTYPE, PriceSeries
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(module)s - %(funcName)s - %(message)s",
+)
+logging.getLogger().disabled = False
+
+
+class PriceStore:
+    """
+    Local on-disk store of per-symbol price history.
+
+    Each symbol is one .npy file of fixed-width PRICE_RECORD_DTYPE records
+    sorted by time. Reads memory-map the file read-only, so every process
+    running job 4 shares the same page cache pages instead of downloading
+    and decoding its own copy. Files are replaced atomically, so existing
+    maps keep reading the previous version.
+
+    Args:
+        root (str, optional): The store directory. Defaults to the
+            PRICE_STORE_DIR environment variable or ".cache/price_store".
+    """
+
+    def __init__(self, root: Optional[str] = None) -> None:
+        self.root = root or os.getenv("PRICE_STORE_DIR", ".cache/price_store")
+
+    def path_for(self, symbol: str) -> str:
+        return os.path.join(self.root, f"{symbol.replace(os.sep, '_')}.npy")
+
+    def age(self, symbol: str) -> Optional[float]:
+        """Returns the seconds since the symbol was stored, if it is stored."""
+        try:
+            return time.time() - os.path.getmtime(self.path_for(symbol))
+        except OSError:
+            return None
+
+    def get(
+        self, symbol: str, max_age: Optional[float] = None
+    ) -> Optional[PriceSeries]:
+        path = self.path_for(symbol)
+        if max_age is not None:
+            age = self.age(symbol)
+            if age is None or age > max_age:
+                return None
+        try:
+            records = np.load(path, mmap_mode="r", allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(
+                f"Discarding unreadable price store file for {symbol} - {e}"
+            )
+            return None
+
+        if records.dtype != PRICE_RECORD_DTYPE or records.ndim != 1:
+            logging.warning(
+                f"Discarding price store file for {symbol} with dtype {records.dtype}"
+            )
+            return None
+        return PriceSeries.from_records(symbol, records)
+
+    def put(self, series: PriceSeries) -> None:
+        path = self.path_for(series.symbol)
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, series.to_records(), allow_pickle=False)
+            os.replace(tmp_path, path)
+            logging.debug(f"Stored {len(series)} bars for {series.symbol}")
+        except OSError as e:
+            logging.error(f"Error storing price history for {series.symbol} - {e}")
@@ -1,8 +1,12 @@
+import logging
 import random
+import threading
+import time
 import requests
-from pymongo import MongoClient
+from pymongo import MongoClient, errors
 from dotenv import load_dotenv
 import os
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait
 
 load_dotenv()
 
@@ -30,3 +34,88 @@ def setup_session():
     )
     session.get("https://www.set.or.th/th/market/get-quote/stock/")
     return session
+
+
+def run_bounded(executor, fn, items, max_in_flight):
+    """Yields (item, future) as they complete, max_in_flight submitted at most"""
+    in_flight = {}
+    for item in items:
+        if len(in_flight) >= max_in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield in_flight.pop(future), future
+        in_flight[executor.submit(fn, item)] = item
+
+    for future in as_completed(in_flight):
+        yield in_flight[future], future
+
+
+class BulkWriter:
+    """Thread-safe buffer of write operations flushed with bulk_write in batches"""
+
+    def __init__(
+        self,
+        collection,
+        batch_size=500,
+        flush_interval=5.0,
+        on_flush=None,
+        ordered=False,
+    ):
+        self.collection = collection
+        self.ordered = ordered
+        self.batch_size = batch_size
+        # Only checked by add(), there is no timer: flush() or leave the
+        # context to write what is still buffered
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.written = 0
+        self._operations = []
+        self._acks = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, operations, ack=None):
+        with self._lock:
+            self._operations.extend(operations)
+            if ack is not None:
+                self._acks.append(ack)
+            if (
+                len(self._operations) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            ):
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        operations, self._operations = self._operations, []
+        acks, self._acks = self._acks, []
+        self._last_flush = time.monotonic()
+
+        if operations:
+            try:
+                result = self.collection.bulk_write(operations, ordered=self.ordered)
+                self.written += len(operations)
+                logging.info(
+                    f"Flushed {len(operations)} operations to {self.collection.name}: "
+                    f"{result.upserted_count} upserted, {result.modified_count} modified"
+                )
+            except errors.PyMongoError as e:
+                logging.error(f"Error flushing writes to {self.collection.name}: {e}")
+                return
+
+        if acks and self.on_flush:
+            try:
+                self.on_flush(acks)
+            except errors.PyMongoError as e:
+                logging.error(
+                    f"Error acknowledging writes to {self.collection.name}: {e}"
+                )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
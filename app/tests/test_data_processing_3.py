@@ -0,0 +1,153 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+from pymongo import DeleteMany, UpdateOne
+from app.benchmarks.financial_tokenizer import (
+    legacy_scan,
+    random_documents,
+    tokenized_scan,
+)
+from app.benchmarks.html_extraction import FIXTURE_DIR, load_corpus
+from app.services.data_processing_3 import (
+    PROFIT_MARKER,
+    QUARTER_SECTION,
+    YEAR,
+    fetch_process_save_news_items,
+    parse_financial_content,
+    tokenize_financial_content,
+)
+
+
+class TestParseFinancialContent(unittest.TestCase):
+    def test_parse_financial_content_matches_golden_corpus(self):
+        with open(os.path.join(FIXTURE_DIR, "golden.json")) as f:
+            golden = json.load(f)
+
+        for name, document in load_corpus().items():
+            with self.subTest(fixture=name):
+                news_item = {
+                    "symbol": name.split(".")[0].upper(),
+                    "datetime": "2024-05-14T17:38:00+07:00",
+                }
+                result = parse_financial_content(
+                    document, news_item, f"https://example.com/{name}"
+                )
+                result["datetime"] = result["datetime"].isoformat()
+                self.assertEqual(result, golden[name])
+
+    def test_tokenizer_matches_legacy_regex_scans(self):
+        for document in random_documents(500):
+            with self.subTest(document=document):
+                self.assertEqual(tokenized_scan(document), legacy_scan(document))
+
+    def test_tokenize_financial_content_emits_typed_tokens(self):
+        tokens = tokenize_financial_content("Quarter 1 Year 2024 Profit 1,234")
+
+        self.assertIn((QUARTER_SECTION, "Quarter 1"), tokens)
+        self.assertIn((YEAR, "2024"), tokens)
+        self.assertIn((PROFIT_MARKER, "Profit"), tokens)
+
+
+class TestFetchProcessSaveNewsItems(unittest.TestCase):
+    @patch("app.services.data_processing_3.ensure_news_processed_flags")
+    @patch("app.services.data_processing_3.ensure_processed_indexes")
+    @patch("app.services.data_processing_3.processed_collection")
+    @patch("app.services.data_processing_3.news_collection")
+    @patch("app.services.data_processing_3.fetch_content")
+    def test_pipeline_parses_in_worker_processes_and_saves(
+        self,
+        mock_fetch_content,
+        mock_news_collection,
+        mock_processed_collection,
+        mock_ensure_indexes,
+        mock_ensure_flags,
+    ):
+        corpus = load_corpus()
+        news_items = [
+            {
+                "_id": index,
+                "url": f"https://example.com/{name}",
+                "symbol": "AAI",
+                "datetime": "2024-05-14T17:38:00+07:00",
+                "headline": "Reviewed Quarterly Financial Statement (F45)",
+            }
+            for index, name in enumerate(sorted(corpus))
+        ]
+        news_items.append(
+            {
+                "_id": 99,
+                "url": "https://example.com/dividend",
+                "symbol": "AAI",
+                "datetime": "2024-05-14T17:38:00+07:00",
+                "headline": "Dividend payment",
+            }
+        )
+        mock_news_collection.find.return_value.sort.return_value.batch_size.return_value = (
+            news_items
+        )
+        mock_fetch_content.side_effect = lambda url, cache_only: corpus[
+            url.rsplit("/", 1)[1]
+        ]
+
+        fetch_process_save_news_items(
+            reparse_from_cache=False, io_workers=2, parse_workers=2
+        )
+
+        operations = [
+            operation
+            for call in mock_processed_collection.bulk_write.call_args_list
+            for operation in call[0][0]
+        ]
+        self.assertEqual(len(operations), 5)
+        marked = [
+            news_id
+            for call in mock_news_collection.update_many.call_args_list
+            for news_id in call[0][0]["_id"]["$in"]
+        ]
+        self.assertIn(99, marked)
+        self.assertEqual(len(marked), len(news_items))
+
+    @patch("app.services.data_processing_3.ensure_news_processed_flags")
+    @patch("app.services.data_processing_3.ensure_processed_indexes")
+    @patch("app.services.data_processing_3.processed_collection")
+    @patch("app.services.data_processing_3.news_collection")
+    @patch("app.services.data_processing_3.fetch_content")
+    def test_reparse_replaces_existing_entries_of_each_url(
+        self,
+        mock_fetch_content,
+        mock_news_collection,
+        mock_processed_collection,
+        mock_ensure_indexes,
+        mock_ensure_flags,
+    ):
+        corpus = load_corpus()
+        name = "q1_profit.html"
+        url = f"https://example.com/{name}"
+        mock_news_collection.find.return_value.sort.return_value.batch_size.return_value = [
+            {
+                "_id": 1,
+                "url": url,
+                "symbol": "AAI",
+                "datetime": "2024-05-14T17:38:00+07:00",
+                "headline": "Reviewed Quarterly Financial Statement (F45)",
+            }
+        ]
+        mock_fetch_content.return_value = corpus[name]
+
+        fetch_process_save_news_items(
+            reparse_from_cache=True, io_workers=1, parse_workers=1
+        )
+
+        mock_news_collection.find.assert_called_once_with({})
+        (operations,), kwargs = mock_processed_collection.bulk_write.call_args
+        self.assertTrue(kwargs["ordered"])
+        # The stale entries go first, even if the reparsed Year or Quarter changed
+        self.assertIsInstance(operations[0], DeleteMany)
+        self.assertEqual(operations[0]._filter, {"Url": url})
+        self.assertTrue(all(isinstance(op, UpdateOne) for op in operations[1:]))
+        self.assertEqual(len(operations), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
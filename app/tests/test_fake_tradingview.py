@@ -0,0 +1,66 @@
+import unittest
+from app.benchmarks.fake_tradingview import FakeTradingViewServer, RecordedSession
+from app.benchmarks.tv_datafeed import bench_connections, bench_get_hist
+from app.tvDatafeed.main import Interval, TvDatafeed
+
+
+class TestFakeTradingViewServer(unittest.TestCase):
+    def test_get_hist_replays_recorded_bars(self):
+        with FakeTradingViewServer() as server:
+            data = TvDatafeed(ws_url=server.url).get_hist(
+                "PTT", "SET", Interval.in_daily, n_bars=300
+            )
+
+        self.assertEqual(len(data), 300)
+        self.assertEqual(data["symbol"].iloc[0], "SET:PTT")
+        self.assertEqual(data["close"].iloc[-1], 34.5)
+        self.assertTrue(data.index.is_monotonic_increasing)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(server.requests["create_series"], 1)
+
+    def test_get_hist_pages_reaches_start_of_history(self):
+        session = RecordedSession(history_bars=25)
+        with FakeTradingViewServer(session=session) as server:
+            pages = list(
+                TvDatafeed(ws_url=server.url).get_hist_pages("PTT", "SET", page_bars=10)
+            )
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(server.requests["request_more_data"], 3)
+
+    def test_dropped_connections_are_retried(self):
+        with FakeTradingViewServer(disconnect_after=1) as server:
+            results = dict(
+                TvDatafeed(ws_url=server.url).get_hist_many(
+                    ["AAA", "BBB", "INVALID"], "SET", n_bars=5, max_series=1
+                )
+            )
+
+        self.assertEqual(len(results["AAA"]), 5)
+        self.assertEqual(len(results["BBB"]), 5)
+        self.assertIsNone(results["INVALID"])
+        self.assertGreaterEqual(server.connections, 2)
+
+    def test_throttled_handshakes_are_refused(self):
+        with FakeTradingViewServer(max_connections_per_second=1) as server:
+            tv = TvDatafeed(ws_url=server.url)
+            first = tv.get_hist("PTT", "SET", n_bars=2)
+            tv.close()
+            second = tv.get_hist("PTT", "SET", n_bars=2)
+
+        self.assertEqual(len(first), 2)
+        self.assertIsNone(second)
+        self.assertGreaterEqual(server.refused, 1)
+
+    def test_benchmarks_report_rates(self):
+        with FakeTradingViewServer() as server:
+            throughput = bench_get_hist(server.url, n_bars=50, repeat=2)
+            connections = bench_connections(server.url, repeat=2)
+
+        self.assertGreater(throughput["bars_per_second"], 0)
+        self.assertGreater(connections["connections_per_second"], 0)
+        self.assertEqual(server.connections, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+from app.services.fetch_news_2 import (
+    NewsItem,
+    NewsUrlIndex,
+    fetch_and_save_news,
+    fetch_and_save_news_concurrently,
+    get_incremental_from_date,
+    save_news_to_mongo,
+    update_news_watermark,
+)
+from app.services.utils import run_bounded
+
+
+class TestRunBounded(unittest.TestCase):
+    def test_run_bounded_limits_in_flight(self):
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+
+        def work(item):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.01)
+            with lock:
+                state["running"] -= 1
+            return item * 2
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = {
+                item: future.result()
+                for item, future in run_bounded(executor, work, range(20), 3)
+            }
+
+        self.assertEqual(results, {item: item * 2 for item in range(20)})
+        self.assertLessEqual(state["peak"], 3)
+
+
+class TestFetchAndSaveNewsConcurrently(unittest.TestCase):
+    @patch("app.services.fetch_news_2.db")
+    @patch("app.services.fetch_news_2.fetch_and_save_news")
+    def test_fetch_and_save_news_concurrently_all_symbols(
+        self, mock_fetch_and_save, mock_db
+    ):
+        session = MagicMock()
+        symbols = ["ABC", "DEF", "GHI", "JKL"]
+
+        latencies = fetch_and_save_news_concurrently(
+            session, symbols, max_workers=2, max_in_flight=2
+        )
+
+        self.assertEqual(set(latencies), set(symbols))
+        self.assertEqual(mock_fetch_and_save.call_count, len(symbols))
+        args, kwargs = mock_fetch_and_save.call_args
+        self.assertFalse(kwargs["full_resync"])
+        self.assertIsInstance(kwargs["url_index"], NewsUrlIndex)
+
+    @patch("app.services.fetch_news_2.db")
+    @patch("app.services.fetch_news_2.fetch_and_save_news")
+    def test_fetch_and_save_news_concurrently_skips_failed_symbols(
+        self, mock_fetch_and_save, mock_db
+    ):
+        def fail_on_def(session, symbol, full_resync, url_index):
+            if symbol == "DEF":
+                raise RuntimeError("boom")
+
+        mock_fetch_and_save.side_effect = fail_on_def
+
+        latencies = fetch_and_save_news_concurrently(
+            MagicMock(), ["ABC", "DEF"], max_workers=2
+        )
+
+        self.assertEqual(list(latencies), ["ABC"])
+
+
+class TestNewsWatermarks(unittest.TestCase):
+    def test_get_incremental_from_date_without_watermark(self):
+        self.assertIsNone(get_incremental_from_date(None, full_resync=False))
+
+    def test_get_incremental_from_date_with_recent_full_sync(self):
+        last_news = datetime(2024, 5, 14, 10, 0)
+        watermark = {
+            "symbol": "ABC",
+            "lastNewsDatetime": last_news,
+            "lastFullSyncAt": datetime.now() - timedelta(days=1),
+        }
+
+        from_date = get_incremental_from_date(watermark, full_resync=False)
+
+        self.assertEqual(from_date, last_news - timedelta(days=1))
+        self.assertIsNone(get_incremental_from_date(watermark, full_resync=True))
+
+    def test_get_incremental_from_date_with_stale_full_sync(self):
+        watermark = {
+            "symbol": "ABC",
+            "lastNewsDatetime": datetime(2024, 5, 14, 10, 0),
+            "lastFullSyncAt": datetime.now() - timedelta(days=365),
+        }
+
+        self.assertIsNone(get_incremental_from_date(watermark, full_resync=False))
+
+    @patch("app.services.fetch_news_2.db")
+    def test_update_news_watermark(self, mock_db):
+        news = [
+            MagicMock(spec=NewsItem, datetime="2024-05-14T17:38:00+07:00"),
+            MagicMock(spec=NewsItem, datetime="2024-02-20T08:00:00+07:00"),
+        ]
+
+        update_news_watermark("ABC", news, full_sync=True)
+
+        filter_doc, update = mock_db.news_watermarks.update_one.call_args[0]
+        self.assertEqual(filter_doc, {"symbol": "ABC"})
+        self.assertEqual(
+            update["$max"]["lastNewsDatetime"],
+            datetime.fromisoformat("2024-05-14T17:38:00+07:00"),
+        )
+        self.assertIn("lastFullSyncAt", update["$set"])
+
+
+def make_news_item(url, headline="Reviewed Quarterly Financial Statement (F45)"):
+    return NewsItem(
+        url=url,
+        datetime="2024-05-14T17:38:00+07:00",
+        headline=headline,
+        id="1",
+        isTodayNews=False,
+        lang="en",
+        marketAlertTypeId=None,
+        percentPriceChange=None,
+        product="S",
+        source="ABC",
+        symbol="ABC",
+        tag="",
+        viewClarification=None,
+    )
+
+
+class TestSaveNewsToMongo(unittest.TestCase):
+    @patch("app.services.fetch_news_2.db")
+    def test_save_news_to_mongo_skips_known_urls_without_queries(self, mock_db):
+        url_index = NewsUrlIndex(["https://example.com/known"])
+        news = [
+            make_news_item("https://example.com/known"),
+            make_news_item("https://example.com/new"),
+            make_news_item("https://example.com/other", headline="Dividend"),
+        ]
+
+        save_news_to_mongo(news, url_index)
+
+        mock_db.news.find_one.assert_not_called()
+        mock_db.news.find.assert_not_called()
+        operations = mock_db.news.bulk_write.call_args[0][0]
+        self.assertEqual(len(operations), 1)
+        self.assertIn("https://example.com/new", url_index)
+
+    @patch("app.services.fetch_news_2.db")
+    def test_save_news_to_mongo_without_index_uses_single_query(self, mock_db):
+        mock_db.news.find.return_value = [{"url": "https://example.com/known"}]
+        news = [
+            make_news_item("https://example.com/known"),
+            make_news_item("https://example.com/new"),
+        ]
+
+        save_news_to_mongo(news)
+
+        self.assertEqual(mock_db.news.find.call_count, 1)
+        operations = mock_db.news.bulk_write.call_args[0][0]
+        self.assertEqual(len(operations), 1)
+
+    @patch("app.services.fetch_news_2.db")
+    def test_save_news_to_mongo_reports_failed_write(self, mock_db):
+        mock_db.news.bulk_write.side_effect = Exception("write failed")
+        url_index = NewsUrlIndex()
+
+        saved = save_news_to_mongo(
+            [make_news_item("https://example.com/new")], url_index
+        )
+
+        self.assertFalse(saved)
+        self.assertNotIn("https://example.com/new", url_index)
+
+    @patch("app.services.fetch_news_2.update_news_watermark")
+    @patch("app.services.fetch_news_2.save_news_to_mongo", return_value=False)
+    @patch("app.services.fetch_news_2.get_news_for_symbol")
+    @patch("app.services.fetch_news_2.get_news_watermark", return_value=None)
+    def test_fetch_and_save_news_keeps_watermark_after_failed_save(
+        self, mock_watermark, mock_get_news, mock_save, mock_update_watermark
+    ):
+        mock_get_news.return_value = [make_news_item("https://example.com/new")]
+
+        fetch_and_save_news(MagicMock(), "ABC")
+
+        mock_save.assert_called_once()
+        mock_update_watermark.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+import pandas as pd
+from app.services import fetch_price_4
+from app.services.price_history import PriceHistoryCache
+
+
+def page(days):
+    index = pd.to_datetime(days).rename("datetime")
+    return pd.DataFrame(
+        {
+            "symbol": "SET:ABC",
+            "open": 10.0,
+            "high": 11.0,
+            "low": 9.0,
+            "close": [10.0 + i for i in range(len(days))],
+            "volume": 1000.0,
+        },
+        index=index,
+    )
+
+
+def deep_pages(*args, **kwargs):
+    yield page(["2024-05-14 10:00:00", "2024-05-15 10:00:00"])
+    yield page(["2001-03-01 10:00:00", "2001-03-02 10:00:00"])
+
+
+@patch.object(fetch_price_4, "PRICE_HISTORY_START", "2000-01-01")
+@patch.object(fetch_price_4, "price_store")
+@patch.object(fetch_price_4, "cache_collection")
+@patch.object(fetch_price_4, "tv_pool")
+class TestDeepPriceHistory(unittest.TestCase):
+    def setUp(self):
+        cache = patch.object(fetch_price_4, "price_cache", PriceHistoryCache(1 << 20))
+        cache.start()
+        self.addCleanup(cache.stop)
+
+    @patch.object(fetch_price_4, "predict_collection")
+    @patch.object(fetch_price_4, "processed_collection")
+    def test_batch_path_pages_uncached_symbols(
+        self, processed, predict, tv_pool, cache_collection, price_store
+    ):
+        processed.find.return_value = [
+            {
+                "Symbol": "ABC",
+                "Year": 2001,
+                "Quarter": "Q1",
+                "Url": "https://example.com/f45",
+                "EPS": 0.5,
+                "Datetime": datetime(2001, 3, 2, 17, 0),
+            }
+        ]
+        cache_collection.find.return_value = []
+        cache_collection.find_one.return_value = None
+        price_store.get.return_value = None
+        tv_pool.get_hist_pages.side_effect = deep_pages
+
+        fetch_price_4.calculate_predicted_prices_batch(max_workers=2)
+
+        tv_pool.get_hist_many.assert_not_called()
+        self.assertEqual(tv_pool.get_hist_pages.call_args[1]["start"], "2000-01-01")
+        saved = cache_collection.update_one.call_args[0][1]["$set"]
+        self.assertEqual(saved["length"], 4)
+        (operations,) = predict.bulk_write.call_args[0]
+        self.assertEqual(len(operations), 1)
+        self.assertEqual(operations[0]._doc["$set"]["ClosePrice"], 11.0)
+
+    def test_failed_paging_saves_nothing(self, tv_pool, cache_collection, price_store):
+        def failing_pages(*args, **kwargs):
+            yield page(["2024-05-14 10:00:00"])
+            raise ConnectionError("Connection to remote host was lost")
+
+        tv_pool.get_hist_pages.side_effect = failing_pages
+
+        self.assertIsNone(fetch_price_4.fetch_full_price_history("ABC"))
+        cache_collection.update_one.assert_not_called()
+
+    @patch.object(fetch_price_4, "ensure_predict_indexes")
+    @patch.object(fetch_price_4, "calculate_predicted_prices_batch")
+    def test_pool_is_closed_when_the_batch_fails(
+        self, batch, ensure_indexes, tv_pool, cache_collection, price_store
+    ):
+        batch.side_effect = ConnectionError("Connection to remote host was lost")
+
+        with self.assertRaises(ConnectionError):
+            fetch_price_4.calculate_and_save_predicted_prices(max_workers=2, batch=True)
+
+        tv_pool.close.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import gzip
+import json
+import tempfile
+import unittest
+from app.services.html_cache import HtmlCache
+
+
+class TestHtmlCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = HtmlCache(self.tmp_dir.name)
+        self.url = "https://www.set.or.th/en/market/news-and-alert/newsdetails?id=1"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_and_get(self):
+        self.assertIsNone(self.cache.get(self.url))
+
+        self.cache.put(self.url, "<div class='raw-html'>Quarter 1</div>")
+
+        self.assertEqual(
+            self.cache.get(self.url), "<div class='raw-html'>Quarter 1</div>"
+        )
+        entry = self.cache.get_entry(self.url)
+        self.assertEqual(entry["url"], self.url)
+        self.assertIn("fetchedAt", entry)
+
+    def test_get_discards_corrupted_entry(self):
+        self.cache.put(self.url, "original")
+        path = self.cache.path_for(self.url)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            entry = json.load(f)
+        entry["content"] = "tampered"
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(entry, f)
+
+        self.assertIsNone(self.cache.get(self.url))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from app.benchmarks.html_extraction import load_corpus
+from app.services.html_extract import (
+    FastPathUnsupported,
+    extract_content_text,
+    extract_fast,
+    extract_with_bs4,
+)
+
+
+class TestHtmlExtract(unittest.TestCase):
+    def test_fast_path_matches_bs4_on_fixture_corpus(self):
+        corpus = load_corpus()
+        self.assertTrue(corpus)
+        for name, document in corpus.items():
+            with self.subTest(fixture=name):
+                self.assertEqual(
+                    extract_content_text(document, backend="fast"),
+                    extract_with_bs4(document),
+                )
+
+    def test_fast_path_matches_bs4_on_edge_cases(self):
+        documents = [
+            '<div class="a raw-html">Hello &amp; <b>world</b><div>in</div>&#150;</div>x',
+            "<DIV CLASS='raw-html'>A &foo; B &nbsp;C</DIV>",
+            '<div class="raw-html"/>after',
+            '<div class="raw-html"><div><div>2024</div></div> 2023 < 5</div>',
+            "<p>no content block</p>",
+            '<div class="raw-html">a<br>b<img src="x.png"><span/>c</div>',
+        ]
+        for document in documents:
+            with self.subTest(document=document):
+                self.assertEqual(extract_fast(document), extract_with_bs4(document))
+
+    def test_fast_path_rejects_markup_it_cannot_mirror(self):
+        documents = [
+            '<div class="raw-html">x<!-- hidden -->y</div>',
+            '<div class="raw-html">x<script>var a = "</div>";</script></div>',
+            '<div class="raw-html">AT&T</div>',
+            '<!-- <div class="raw-html">old</div> --><div class="raw-html">new</div>',
+            '<span><div class="raw-html">a</span>b</div>',
+            '<div class="raw-html"><p>a<b>b</p>c</b></div>',
+        ]
+        for document in documents:
+            with self.subTest(document=document):
+                with self.assertRaises(FastPathUnsupported):
+                    extract_fast(document)
+                self.assertEqual(
+                    extract_content_text(document, backend="fast"),
+                    extract_with_bs4(document),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
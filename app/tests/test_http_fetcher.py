@@ -0,0 +1,128 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch, MagicMock
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.services.http_fetcher import HttpFetcher
+
+
+def make_response(status_code, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+
+class TestHttpFetcher(unittest.TestCase):
+    @patch("app.services.http_fetcher.time")
+    def test_get_retries_retryable_status_with_backoff(self, mock_time):
+        session = MagicMock()
+        session.get.side_effect = [make_response(503), make_response(200)]
+        fetcher = HttpFetcher(session=session, retries=3, timeout=(1, 2))
+
+        response = fetcher.get("https://www.set.or.th/a")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session.get.call_count, 2)
+        self.assertEqual(session.get.call_args[1]["timeout"], (1, 2))
+        mock_time.sleep.assert_called_once()
+
+    @patch("app.services.http_fetcher.time")
+    def test_get_honours_retry_after(self, mock_time):
+        session = MagicMock()
+        session.get.side_effect = [
+            make_response(429, {"Retry-After": "7"}),
+            make_response(200),
+        ]
+
+        HttpFetcher(session=session).get("https://www.set.or.th/a")
+
+        mock_time.sleep.assert_called_once_with(7.0)
+
+    @patch("app.services.http_fetcher.time")
+    def test_get_raises_after_last_retry(self, mock_time):
+        session = MagicMock()
+        session.get.side_effect = requests.ConnectionError("reset")
+        fetcher = HttpFetcher(session=session, retries=2)
+
+        with self.assertRaises(requests.ConnectionError):
+            fetcher.get("https://www.set.or.th/a")
+        self.assertEqual(session.get.call_count, 3)
+
+    def test_get_caps_concurrent_requests_per_host(self):
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+
+        def slow_get(url, **kwargs):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.02)
+            with lock:
+                state["running"] -= 1
+            return make_response(200)
+
+        session = MagicMock()
+        session.get.side_effect = slow_get
+        fetcher = HttpFetcher(session=session, pool_maxsize=8, max_per_host=2)
+
+        threads = [
+            threading.Thread(target=fetcher.get, args=("https://www.set.or.th/a",))
+            for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(state["peak"], 2)
+
+    def test_existing_session_keeps_only_its_transport_retries(self):
+        session = requests.Session()
+        retries = Retry(total=5, backoff_factor=1, status_forcelist=[500, 502])
+        session.mount("https://", HTTPAdapter(max_retries=retries))
+
+        HttpFetcher(session=session, pool_maxsize=4)
+
+        adapter = session.get_adapter("https://www.set.or.th")
+        self.assertEqual(adapter.max_retries.total, 5)
+        self.assertEqual(adapter.max_retries.connect, retries.connect)
+        self.assertFalse(adapter.max_retries.status_forcelist)
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+    @patch("app.services.http_fetcher.time")
+    def test_server_errors_are_retried_by_one_layer(self, mock_time):
+        attempts = []
+
+        class FailingHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                attempts.append(self.path)
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), FailingHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        session = requests.Session()
+        retries = Retry(total=5, backoff_factor=1, status_forcelist=[500, 502, 503])
+        session.mount("http://", HTTPAdapter(max_retries=retries))
+        session.mount("https://", HTTPAdapter(max_retries=retries))
+
+        response = HttpFetcher(session=session, retries=2).get(
+            f"http://127.0.0.1:{server.server_address[1]}/news"
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(attempts), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
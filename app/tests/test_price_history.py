@@ -0,0 +1,220 @@
+import unittest
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from app.services.price_history import (
+    PRICE_FIELDS,
+    PRICE_SCHEMA_VERSION,
+    PriceHistoryCache,
+    PriceSeries,
+    compute_predicted_prices,
+)
+
+
+def make_document(symbol="ABC"):
+    return {
+        "symbol": symbol,
+        "data": {
+            "symbol": [f"SET:{symbol}"] * 4,
+            "open": [10.0, 10.5, 11.0, 11.2],
+            "high": [10.6, 11.0, 11.4, 11.5],
+            "low": [9.9, 10.4, 10.9, 11.0],
+            "close": [10.5, 10.9, 11.3, 11.1],
+            "volume": [1000.0, 1200.0, 900.0, 800.0],
+            "datetime": [
+                "2024-05-13 10:00:00",
+                "2024-05-14 10:00:00",
+                "2024-05-15 10:00:00",
+                "2024-05-17 10:00:00",
+            ],
+        },
+    }
+
+
+class TestPriceSeries(unittest.TestCase):
+    def test_close_on_matches_frame_filter(self):
+        document = make_document()
+        series = PriceSeries.from_document(document)
+        frame = pd.DataFrame(document["data"])
+        frame["datetime"] = pd.to_datetime(frame["datetime"])
+
+        for day in range(12, 19):
+            date = datetime(2024, 5, day, 17, 38)
+            expected = frame[frame["datetime"].dt.date == date.date()]
+            with self.subTest(date=date):
+                if expected.empty:
+                    self.assertIsNone(series.close_on(date))
+                else:
+                    self.assertEqual(series.close_on(date), expected.iloc[-1]["close"])
+
+    def test_from_frame_sorts_unordered_bars(self):
+        frame = pd.DataFrame(
+            {"close": [2.0, 1.0]},
+            index=pd.to_datetime(["2024-05-14", "2024-05-13"]),
+        )
+
+        series = PriceSeries.from_frame("ABC", frame)
+
+        self.assertEqual(list(series.close), [1.0, 2.0])
+        self.assertEqual(series.close_on(datetime(2024, 5, 14)), 2.0)
+
+    def test_close_on_many_matches_close_on(self):
+        series = PriceSeries.from_document(make_document())
+        dates = [datetime(2024, 5, day, 17, 38) for day in range(12, 19)]
+
+        closes = series.close_on_many([date.date() for date in dates])
+
+        for date, close in zip(dates, closes):
+            with self.subTest(date=date):
+                expected = series.close_on(date)
+                if expected is None:
+                    self.assertTrue(pd.isna(close))
+                else:
+                    self.assertEqual(close, expected)
+
+    def test_to_document_round_trips_through_from_document(self):
+        series = PriceSeries.from_document(make_document())
+
+        document = series.to_document()
+        restored = PriceSeries.from_document(document)
+
+        self.assertEqual(document["schemaVersion"], PRICE_SCHEMA_VERSION)
+        self.assertIsInstance(document["data"]["close"], bytes)
+        self.assertTrue(np.array_equal(restored.timestamps, series.timestamps))
+        for field in PRICE_FIELDS:
+            self.assertTrue(
+                np.array_equal(getattr(restored, field), getattr(series, field))
+            )
+        self.assertEqual(restored.close_on(datetime(2024, 5, 17)), 11.1)
+
+    def test_merge_appends_recent_bars_and_replaces_partial_bar(self):
+        series = PriceSeries.from_document(make_document())
+        recent = PriceSeries(
+            "ABC",
+            pd.to_datetime(
+                ["2024-05-15 10:00:00", "2024-05-17 10:00:00", "2024-05-20 10:00:00"]
+            ).to_numpy(),
+            close=np.array([11.3, 11.25, 11.6]),
+        )
+
+        merged = series.merge(recent)
+
+        self.assertEqual(list(merged.close), [10.5, 10.9, 11.3, 11.25, 11.6])
+        self.assertEqual(merged.close_on(datetime(2024, 5, 20)), 11.6)
+
+    def test_merge_rejects_adjusted_history(self):
+        series = PriceSeries.from_document(make_document())
+        adjusted = PriceSeries(
+            "ABC",
+            pd.to_datetime(["2024-05-15 10:00:00", "2024-05-20 10:00:00"]).to_numpy(),
+            close=np.array([5.65, 5.8]),
+        )
+        disjoint = PriceSeries(
+            "ABC",
+            pd.to_datetime(["2024-05-20 10:00:00"]).to_numpy(),
+            close=np.array([11.6]),
+        )
+
+        self.assertIsNone(series.merge(adjusted))
+        self.assertIsNone(series.merge(disjoint))
+
+    def test_price_as_of_resolves_missing_days_by_mode(self):
+        series = PriceSeries.from_document(make_document())
+        thursday = datetime(2024, 5, 16, 17, 38)
+
+        self.assertIsNone(series.price_as_of(thursday, "exact"))
+        self.assertEqual(series.price_as_of(thursday, "previous_close"), 11.3)
+        self.assertEqual(series.price_as_of(thursday, "next_open"), 11.2)
+        self.assertEqual(series.price_as_of(thursday, "next_close"), 11.1)
+        self.assertIsNone(series.price_as_of(datetime(2024, 5, 17), "next_close"))
+        self.assertIsNone(series.price_as_of(datetime(2024, 5, 12), "previous_close"))
+
+    def test_price_as_of_many_applies_max_gap(self):
+        series = PriceSeries.from_document(make_document())
+        days = np.array(["2024-05-16", "2024-05-19", "2024-05-30"], dtype="M8[D]")
+
+        prices = series.price_as_of_many(days, "previous_close", max_gap_days=2)
+
+        self.assertEqual(prices[0], 11.3)
+        self.assertEqual(prices[1], 11.1)
+        self.assertTrue(np.isnan(prices[2]))
+
+    def test_price_as_of_rejects_unknown_mode(self):
+        series = PriceSeries.from_document(make_document())
+
+        with self.assertRaises(ValueError):
+            series.price_as_of(datetime(2024, 5, 16), "nearest")
+
+
+class TestComputePredictedPrices(unittest.TestCase):
+    def test_compute_predicted_prices_matches_per_entry_formula(self):
+        series_by_symbol = {
+            "AAA": PriceSeries.from_document(make_document("AAA")),
+            "BBB": PriceSeries.from_document(make_document("BBB")),
+        }
+        entries = pd.DataFrame(
+            {
+                "Symbol": ["AAA", "BBB", "AAA", "AAA", "CCC"],
+                "EPS": [0.25, 1.5, 0.0, 0.3, 0.4],
+                "Datetime": [
+                    datetime(2024, 5, 14, 10, 38),
+                    datetime(2024, 5, 17, 10, 38),
+                    datetime(2024, 5, 15, 10, 38),
+                    datetime(2024, 5, 16, 10, 38),
+                    datetime(2024, 5, 14, 10, 38),
+                ],
+            }
+        )
+
+        result = compute_predicted_prices(entries, series_by_symbol, mode="exact")
+
+        expected = []
+        for entry in entries.to_dict("records"):
+            series = series_by_symbol.get(entry["Symbol"])
+            close = series.close_on(entry["Datetime"]) if series else None
+            sum_eps = entry["EPS"] + entry["EPS"]
+            if close is None or sum_eps == 0:
+                continue
+            predict = close + entry["EPS"] * (close / sum_eps)
+            expected.append((entry["Symbol"], round(close, 2), round(predict, 2)))
+        self.assertEqual(
+            list(
+                zip(
+                    result["Symbol"],
+                    result["ClosePrice"],
+                    result["PredictPrice"],
+                )
+            ),
+            expected,
+        )
+
+    def test_compute_predicted_prices_defaults_to_price_as_of_mode(self):
+        series = PriceSeries.from_document(make_document("AAA"))
+        thursday = datetime(2024, 5, 16, 17, 38)
+        entries = pd.DataFrame(
+            {"Symbol": ["AAA"], "EPS": [0.5], "Datetime": [thursday]}
+        )
+
+        result = compute_predicted_prices(entries, {"AAA": series})
+
+        self.assertEqual(list(result["ClosePrice"]), [series.price_as_of(thursday)])
+
+
+class TestPriceHistoryCache(unittest.TestCase):
+    def test_cache_evicts_least_recently_used_over_budget(self):
+        first = PriceSeries.from_document(make_document("AAA"))
+        cache = PriceHistoryCache(max_bytes=first.nbytes * 2)
+
+        cache.put("AAA", first)
+        cache.put("BBB", PriceSeries.from_document(make_document("BBB")))
+        cache.get("AAA")
+        cache.put("CCC", PriceSeries.from_document(make_document("CCC")))
+
+        self.assertIn("AAA", cache)
+        self.assertNotIn("BBB", cache)
+        self.assertIn("CCC", cache)
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+import numpy as np
+from app.services.price_history import PriceSeries
+from app.services.price_store import PriceStore
+from app.tests.test_price_history import make_document
+
+
+class TestPriceStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = PriceStore(self.tmp_dir.name)
+        self.series = PriceSeries.from_document(make_document())
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_and_get_memory_maps_records(self):
+        self.assertIsNone(self.store.get("ABC"))
+
+        self.store.put(self.series)
+        stored = self.store.get("ABC")
+
+        self.assertIsInstance(stored.close.base, np.memmap)
+        self.assertFalse(stored.close.flags.writeable)
+        self.assertTrue(np.array_equal(stored.timestamps, self.series.timestamps))
+        self.assertEqual(stored.close_on(datetime(2024, 5, 15)), 11.3)
+        self.assertIsNone(stored.close_on(datetime(2024, 5, 16)))
+
+    def test_get_skips_entries_older_than_max_age(self):
+        self.store.put(self.series)
+        path = self.store.path_for("ABC")
+        os.utime(path, (0, 0))
+
+        self.assertIsNone(self.store.get("ABC", max_age=3600))
+        self.assertIsNotNone(self.store.get("ABC"))
+
+    def test_get_discards_unreadable_file(self):
+        os.makedirs(self.tmp_dir.name, exist_ok=True)
+        with open(self.store.path_for("ABC"), "wb") as f:
+            f.write(b"not an npy file")
+
+        self.assertIsNone(self.store.get("ABC"))
+
+
+if __name__ == "__main__":
+    unittest.main()
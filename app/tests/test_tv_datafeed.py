@@ -0,0 +1,300 @@
+import json
+import unittest
+from unittest.mock import patch
+from websocket import WebSocketConnectionClosedException
+from app.tvDatafeed.main import Interval, TvDatafeed
+
+
+def frame(payload):
+    return f"~m~{len(payload)}~m~{payload}"
+
+
+def message(func, params):
+    return frame(json.dumps({"m": func, "p": params}, separators=(",", ":")))
+
+
+def bars(start=1715565600, count=3):
+    return [
+        {
+            "i": i,
+            "v": [start + i * 86400, 10.0 + i, 11.0 + i, 9.0 + i, 10.5 + i, 1000.0],
+        }
+        for i in range(count)
+    ]
+
+
+class FakeWebSocket:
+    """Answers create_series with a timescale_update and series_completed."""
+
+    def __init__(self, fail_after=None, older_pages=0):
+        self.connected = True
+        self.sent = []
+        self.inbox = []
+        self.fail_after = fail_after
+        self.symbols = {}
+        self.open_series = 0
+        self.peak_open_series = 0
+        self.older_pages = older_pages
+        self.oldest = 1715565600
+
+    def send(self, data):
+        self.sent.append(data)
+        request = json.loads(data.split("~m~", 2)[2]) if "~h~" not in data else None
+        if request and request["m"] == "resolve_symbol":
+            self.symbols[request["p"][1]] = json.loads(request["p"][2][1:])["symbol"]
+        if request and request["m"] == "remove_series":
+            self.open_series -= 1
+        if request and request["m"] == "request_more_data":
+            chart_session, series_id = request["p"][0], request["p"][1]
+            older = []
+            if self.older_pages:
+                # pages restart their indexes and repeat the oldest bar sent
+                self.older_pages -= 1
+                self.oldest -= 3 * 86400
+                older = bars(self.oldest, 4)
+            self.inbox.append(
+                message(
+                    "timescale_update",
+                    [chart_session, {series_id: {"node": "n", "s": older}}],
+                )
+            )
+            self.inbox.append(message("series_completed", [chart_session, series_id]))
+        if request and request["m"] == "create_series":
+            chart_session, series_id = request["p"][0], request["p"][1]
+            self.open_series += 1
+            self.peak_open_series = max(self.peak_open_series, self.open_series)
+            symbol_id = request["p"][3]
+            if "BAD" in self.symbols[symbol_id]:
+                self.inbox.append(
+                    message("symbol_error", [chart_session, symbol_id, "invalid"])
+                )
+                return
+            self.inbox.append(frame("~h~1"))
+            self.inbox.append(
+                message(
+                    "timescale_update",
+                    [
+                        chart_session,
+                        {series_id: {"node": "n", "s": bars(), "t": series_id}},
+                    ],
+                )
+            )
+            self.inbox.append(
+                message("series_completed", [chart_session, series_id, "streaming"])
+            )
+
+    def recv(self):
+        if self.fail_after is not None:
+            if self.fail_after == 0:
+                self.connected = False
+                raise WebSocketConnectionClosedException(
+                    "Connection is already closed."
+                )
+            self.fail_after -= 1
+        return self.inbox.pop(0)
+
+    def close(self):
+        self.connected = False
+
+    def sent_functions(self):
+        return [
+            json.loads(data.split("~m~", 2)[2])["m"]
+            for data in self.sent
+            if "~h~" not in data
+        ]
+
+
+class CoalescingWebSocket(FakeWebSocket):
+    """Delivers everything queued in one recv, ending mid-frame after a heartbeat."""
+
+    def send(self, data):
+        super().send(data)
+        if '"create_series"' in data:
+            self.inbox.append(frame("~h~2"))
+
+    def recv(self):
+        data, self.inbox = "".join(self.inbox), []
+        self.inbox.append(data[-2:])
+        return data[:-2]
+
+
+class StrayCompletionWebSocket(FakeWebSocket):
+    """Sends a series_completed for another series before the requested bars."""
+
+    def send(self, data):
+        super().send(data)
+        if '"create_series"' in data:
+            chart_session = json.loads(data.split("~m~", 2)[2])["p"][0]
+            self.inbox.insert(
+                -2, message("series_completed", [chart_session, "s999", "streaming"])
+            )
+
+
+class TestTvDatafeedConnection(unittest.TestCase):
+    @patch("app.tvDatafeed.main.create_connection")
+    def test_get_hist_reuses_one_connection(self, mock_create_connection):
+        ws = FakeWebSocket()
+        mock_create_connection.return_value = ws
+        tv = TvDatafeed()
+
+        first = tv.get_hist("AAA", "SET", Interval.in_daily, n_bars=3)
+        second = tv.get_hist("BBB", "SET", Interval.in_daily, n_bars=3)
+
+        mock_create_connection.assert_called_once()
+        self.assertEqual(ws.sent_functions().count("set_auth_token"), 1)
+        self.assertEqual(ws.sent_functions().count("chart_create_session"), 1)
+        self.assertEqual(ws.sent_functions().count("remove_series"), 2)
+        self.assertEqual(list(first["close"]), [10.5, 11.5, 12.5])
+        self.assertEqual(second["symbol"].iloc[0], "SET:BBB")
+        self.assertIn(frame("~h~1"), ws.sent)
+
+    @patch("app.tvDatafeed.main.create_connection")
+    def test_frames_after_series_completed_are_kept(self, mock_create_connection):
+        ws = CoalescingWebSocket()
+        mock_create_connection.return_value = ws
+        tv = TvDatafeed()
+
+        first = tv.get_hist("AAA", "SET", Interval.in_daily, n_bars=3)
+        second = tv.get_hist("BBB", "SET", Interval.in_daily, n_bars=3)
+
+        mock_create_connection.assert_called_once()
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 3)
+        self.assertIn(frame("~h~2"), ws.sent)
+
+    @patch("app.tvDatafeed.main.create_connection")
+    def test_get_hist_reconnects_after_dropped_connection(self, mock_create_connection):
+        dropped, fresh = FakeWebSocket(fail_after=0), FakeWebSocket()
+        mock_create_connection.side_effect = [dropped, fresh]
+        tv = TvDatafeed()
+
+        data = tv.get_hist("AAA", "SET", Interval.in_daily, n_bars=3)
+
+        self.assertEqual(mock_create_connection.call_count, 2)
+        self.assertEqual(len(data), 3)
+        self.assertIs(tv.ws, fresh)
+
+    @patch("app.tvDatafeed.main.create_connection")
+    def test_get_hist_gives_up_after_reconnect_attempts(self, mock_create_connection):
+        mock_create_connection.side_effect = lambda *args, **kwargs: FakeWebSocket(
+            fail_after=0
+        )
+        tv = TvDatafeed()
+
+        self.assertIsNone(tv.get_hist("AAA", "SET", Interval.in_daily, n_bars=3))
+        self.assertEqual(mock_create_connection.call_count, 3)
+        self.assertIsNone(tv.ws)
+
+
+class TestGetHistMany(unittest.TestCase):
+    @patch("app.tvDatafeed.main.create_connection")
+    def test_get_hist_many_multiplexes_series_on_one_connection(
+        self, mock_create_connection
+    ):
+        ws = FakeWebSocket()
+        mock_create_connection.return_value = ws
+        symbols = [f"S{i}" for i in range(7)] + ["BAD"]
+
+        results = dict(
+            TvDatafeed().get_hist_many(
+                symbols, "SET", Interval.in_daily, n_bars=3, max_series=3
+            )
+        )
+
+        mock_create_connection.assert_called_once()
+        self.assertEqual(set(results), set(symbols))
+        self.assertIsNone(results["BAD"])
+        self.assertEqual(list(results["S4"]["close"]), [10.5, 11.5, 12.5])
+        self.assertEqual(results["S4"]["symbol"].iloc[0], "SET:S4")
+        self.assertEqual(ws.peak_open_series, 3)
+        self.assertEqual(ws.open_series, 0)
+
+    @patch("app.tvDatafeed.main.create_connection")
+    def test_get_hist_many_retries_only_unfinished_symbols(
+        self, mock_create_connection
+    ):
+        dropped, fresh = FakeWebSocket(fail_after=4), FakeWebSocket()
+        mock_create_connection.side_effect = [dropped, fresh]
+
+        results = list(
+            TvDatafeed().get_hist_many(
+                ["AAA", "BBB", "CCC"], "SET", n_bars=3, max_series=1
+            )
+        )
+
+        self.assertEqual([symbol for symbol, _ in results], ["AAA", "BBB", "CCC"])
+        self.assertTrue(all(data is not None for _, data in results))
+        self.assertEqual(list(fresh.symbols.values()), ["SET:BBB", "SET:CCC"])
+
+    @patch("app.tvDatafeed.main.create_connection")
+    def test_get_hist_many_ignores_completion_of_other_series(
+        self, mock_create_connection
+    ):
+        mock_create_connection.return_value = StrayCompletionWebSocket()
+
+        results = dict(
+            TvDatafeed().get_hist_many(["AAA", "BBB"], "SET", n_bars=3, max_series=1)
+        )
+
+        self.assertEqual(len(results["AAA"]), 3)
+        self.assertEqual(len(results["BBB"]), 3)
+
+
+class TestGetHistPages(unittest.TestCase):
+    @patch("app.tvDatafeed.main.create_connection")
+    def test_get_hist_pages_requests_older_pages_until_exhausted(
+        self, mock_create_connection
+    ):
+        ws = FakeWebSocket(older_pages=2)
+        mock_create_connection.return_value = ws
+
+        pages = list(TvDatafeed().get_hist_pages("AAA", "SET", page_bars=3))
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 3])
+        self.assertTrue(all(page.index.is_monotonic_increasing for page in pages))
+        self.assertTrue(
+            all(
+                older.index[-1] < newer.index[0]
+                for newer, older in zip(pages, pages[1:])
+            )
+        )
+        self.assertEqual(ws.sent_functions().count("request_more_data"), 3)
+        self.assertEqual(ws.open_series, 0)
+
+    @patch("app.tvDatafeed.main.create_connection")
+    def test_get_hist_pages_stops_at_start_and_max_bars(self, mock_create_connection):
+        ws = FakeWebSocket(older_pages=5)
+        mock_create_connection.return_value = ws
+        tv = TvDatafeed()
+        first = tv.get_hist("AAA", "SET", n_bars=3)
+
+        by_start = list(
+            tv.get_hist_pages("AAA", "SET", page_bars=3, start=first.index[1])
+        )
+        by_count = list(tv.get_hist_pages("AAA", "SET", page_bars=3, max_bars=7))
+
+        self.assertEqual([len(page) for page in by_start], [2])
+        self.assertEqual(by_start[0].index[0], first.index[1])
+        self.assertEqual([len(page) for page in by_count], [3, 3, 1])
+        self.assertEqual(ws.sent_functions().count("request_more_data"), 2)
+        mock_create_connection.assert_called_once()
+
+    @patch("app.tvDatafeed.main.create_connection")
+    def test_get_hist_pages_raises_after_dropped_connection(
+        self, mock_create_connection
+    ):
+        ws = FakeWebSocket(fail_after=3, older_pages=5)
+        mock_create_connection.return_value = ws
+        tv = TvDatafeed()
+        pages = []
+
+        with self.assertRaises(WebSocketConnectionClosedException):
+            for page in tv.get_hist_pages("AAA", "SET", page_bars=3):
+                pages.append(page)
+
+        self.assertEqual(len(pages), 1)
+        self.assertIsNone(tv.ws)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+from app.tvDatafeed.pool import TvDatafeedPool
+
+
+def make_client():
+    tv = MagicMock()
+    tv.ws = None
+    return tv
+
+
+class TestTvDatafeedPool(unittest.TestCase):
+    def test_concurrent_callers_never_share_a_client(self):
+        lock = threading.Lock()
+        state = {"in_use": set(), "shared": False, "peak": 0}
+
+        def get_hist(tv):
+            with lock:
+                state["shared"] |= id(tv) in state["in_use"]
+                state["in_use"].add(id(tv))
+                state["peak"] = max(state["peak"], len(state["in_use"]))
+            time.sleep(0.01)
+            with lock:
+                state["in_use"].discard(id(tv))
+            return "bars"
+
+        def factory():
+            tv = make_client()
+            tv.get_hist.side_effect = lambda *args, **kwargs: get_hist(tv)
+            return tv
+
+        pool = TvDatafeedPool(size=3, factory=factory)
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(pool.get_hist("AAA", "SET"))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results, ["bars"] * 12)
+        self.assertFalse(state["shared"])
+        self.assertEqual(state["peak"], 3)
+
+    def test_idle_clients_are_reused(self):
+        factory = MagicMock(side_effect=make_client)
+        pool = TvDatafeedPool(size=2, factory=factory)
+
+        pool.get_hist("AAA", "SET")
+        pool.get_hist("BBB", "SET")
+
+        factory.assert_called_once()
+
+    def test_failed_client_is_disconnected_before_reuse(self):
+        tv = make_client()
+        tv.get_hist.side_effect = ConnectionError("reset")
+        pool = TvDatafeedPool(size=1, factory=lambda: tv)
+
+        with self.assertRaises(ConnectionError):
+            pool.get_hist("AAA", "SET")
+
+        tv.close.assert_called_once()
+        self.assertIs(pool.acquire(timeout=0), tv)
+
+    def test_stale_connection_is_closed_on_checkout(self):
+        tv = make_client()
+        tv.ws = MagicMock(connected=True)
+        pool = TvDatafeedPool(size=1, max_idle=0, factory=lambda: tv)
+
+        pool.release(pool.acquire())
+        time.sleep(0.01)
+        pool.acquire()
+
+        tv.close.assert_called_once()
+
+    def test_acquire_times_out_when_exhausted(self):
+        pool = TvDatafeedPool(size=1, factory=make_client)
+        pool.acquire()
+
+        with self.assertRaises(TimeoutError):
+            pool.acquire(timeout=0.01)
+
+    def test_get_hist_many_spreads_symbols_over_clients(self):
+        clients = []
+
+        def factory():
+            tv = make_client()
+            tv.get_hist_many.side_effect = lambda symbols, *args, **kwargs: (
+                (symbol, f"bars of {symbol}") for symbol in symbols
+            )
+            clients.append(tv)
+            return tv
+
+        pool = TvDatafeedPool(size=3, factory=factory)
+        symbols = [f"S{i}" for i in range(10)]
+
+        results = dict(pool.get_hist_many(symbols, "SET", n_bars=5))
+
+        self.assertEqual(results, {symbol: f"bars of {symbol}" for symbol in symbols})
+        calls = [call for tv in clients for call in tv.get_hist_many.call_args_list]
+        self.assertEqual(sorted(len(call[0][0]) for call in calls), [3, 3, 4])
+        self.assertTrue(all(call[1] == {"n_bars": 5} for call in calls))
+
+    def test_get_hist_many_reports_symbols_of_failed_client(self):
+        tv = make_client()
+        tv.get_hist_many.side_effect = ConnectionError("reset")
+        pool = TvDatafeedPool(size=1, factory=lambda: tv)
+
+        results = dict(pool.get_hist_many(["AAA", "BBB"], "SET"))
+
+        self.assertEqual(results, {"AAA": None, "BBB": None})
+        tv.close.assert_called_once()
+
+    def test_get_hist_pages_holds_client_until_pages_are_consumed(self):
+        tv = make_client()
+        tv.get_hist_pages.return_value = iter(["newest", "older", "oldest"])
+        pool = TvDatafeedPool(size=1, factory=lambda: tv)
+
+        pages = pool.get_hist_pages("AAA", "SET", start="2000-01-01")
+        self.assertEqual(next(pages), "newest")
+        with self.assertRaises(TimeoutError):
+            pool.acquire(timeout=0)
+        pages.close()
+
+        self.assertIs(pool.acquire(timeout=0), tv)
+        tv.close.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
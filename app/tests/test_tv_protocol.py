@@ -0,0 +1,99 @@
+import datetime
+import json
+import unittest
+from app.tvDatafeed.protocol import (
+    FrameDecoder,
+    ProtocolError,
+    SeriesBuffer,
+    decode_message,
+    is_heartbeat,
+    prepend_header,
+)
+
+
+def bars(count, start=1715565600, volume=True):
+    return [
+        {
+            "i": i,
+            "v": [start + i * 86400, 10.0 + i, 11.0 + i, 9.0 + i, 10.5 + i]
+            + ([1000.0 + i] if volume else []),
+        }
+        for i in range(count)
+    ]
+
+
+class TestFrameDecoder(unittest.TestCase):
+    def test_feed_splits_several_frames_in_one_message(self):
+        message = prepend_header('{"m":"a","p":[]}') + prepend_header("~h~7")
+
+        payloads = FrameDecoder().feed(message)
+
+        self.assertEqual(payloads, ['{"m":"a","p":[]}', "~h~7"])
+        self.assertTrue(is_heartbeat(payloads[1]))
+
+    def test_feed_keeps_partial_frames_until_completed(self):
+        message = prepend_header('{"m":"series_completed","p":["cs_x","s1"]}')
+        decoder = FrameDecoder()
+
+        payloads = []
+        for start in range(0, len(message), 5):
+            payloads += decoder.feed(message[start : start + 5])
+
+        self.assertEqual(
+            decode_message(payloads[0]), ("series_completed", ["cs_x", "s1"])
+        )
+        self.assertEqual(decoder.pending, 0)
+
+    def test_feed_rejects_unframed_data(self):
+        with self.assertRaises(ProtocolError):
+            FrameDecoder().feed('{"m":"a"}')
+        with self.assertRaises(ProtocolError):
+            FrameDecoder().feed("~m~abc~m~{}")
+
+
+class TestSeriesBuffer(unittest.TestCase):
+    def test_to_frame_builds_local_time_ohlcv_frame(self):
+        series = SeriesBuffer(5)
+        series.add(bars(5))
+
+        data = series.to_frame("SET:AAA")
+
+        self.assertEqual(
+            list(data.columns), ["symbol", "open", "high", "low", "close", "volume"]
+        )
+        self.assertEqual(data.index.name, "datetime")
+        self.assertEqual(
+            list(data.index.to_pydatetime()),
+            [datetime.datetime.fromtimestamp(bar["v"][0]) for bar in bars(5)],
+        )
+        self.assertEqual(list(data["volume"]), [1000.0, 1001.0, 1002.0, 1003.0, 1004.0])
+
+    def test_add_grows_buffer_and_applies_updates_by_index(self):
+        series = SeriesBuffer(2)
+        series.add(bars(3))
+        update = bars(4)[3:] + [{"i": 1, "v": [1715565600 + 86400, 1, 2, 3, 4, 5]}]
+
+        series.add(update)
+
+        data = series.to_frame("SET:AAA")
+        self.assertEqual(len(data), 4)
+        self.assertEqual(data["close"].iloc[1], 4.0)
+        self.assertEqual(data["close"].iloc[3], 13.5)
+
+    def test_missing_volume_is_zero(self):
+        series = SeriesBuffer(3)
+        series.add(
+            bars(2, volume=False) + [{"i": 2, "v": [1715738400, 1, 2, 0.5, 1.5, None]}]
+        )
+
+        data = series.to_frame("SET:SET50")
+
+        self.assertEqual(list(data["volume"]), [0.0, 0.0, 0.0])
+        self.assertEqual(data["close"].iloc[2], 1.5)
+
+    def test_to_frame_returns_none_without_bars(self):
+        self.assertIsNone(SeriesBuffer(10).to_frame("SET:AAA"))
+
+
+if __name__ == "__main__":
+    unittest.main()
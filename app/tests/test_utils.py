@@ -0,0 +1,51 @@
+import unittest
+from unittest.mock import MagicMock
+from pymongo import UpdateOne, errors
+from app.services.utils import BulkWriter
+
+
+class TestBulkWriter(unittest.TestCase):
+    def test_bulk_writer_flushes_on_batch_size(self):
+        collection = MagicMock()
+        acked = []
+        writer = BulkWriter(
+            collection, batch_size=3, flush_interval=3600, on_flush=acked.extend
+        )
+
+        writer.add([UpdateOne({"a": 1}, {"$set": {"a": 1}}, upsert=True)], ack="n1")
+        writer.add([UpdateOne({"a": 2}, {"$set": {"a": 2}}, upsert=True)], ack="n2")
+        collection.bulk_write.assert_not_called()
+
+        writer.add([UpdateOne({"a": 3}, {"$set": {"a": 3}}, upsert=True)], ack="n3")
+
+        operations = collection.bulk_write.call_args[0][0]
+        self.assertEqual(len(operations), 3)
+        self.assertFalse(collection.bulk_write.call_args[1]["ordered"])
+        self.assertEqual(acked, ["n1", "n2", "n3"])
+        self.assertEqual(writer.written, 3)
+
+    def test_bulk_writer_flushes_on_exit(self):
+        collection = MagicMock()
+        acked = []
+
+        with BulkWriter(collection, batch_size=100, on_flush=acked.extend) as writer:
+            writer.add([UpdateOne({"a": 1}, {"$set": {"a": 1}})], ack="n1")
+            writer.add([], ack="n2")
+
+        self.assertEqual(collection.bulk_write.call_count, 1)
+        self.assertEqual(acked, ["n1", "n2"])
+
+    def test_bulk_writer_does_not_ack_failed_writes(self):
+        collection = MagicMock()
+        collection.bulk_write.side_effect = errors.BulkWriteError({})
+        acked = []
+
+        with BulkWriter(collection, on_flush=acked.extend) as writer:
+            writer.add([UpdateOne({"a": 1}, {"$set": {"a": 1}})], ack="n1")
+
+        self.assertEqual(acked, [])
+        self.assertEqual(writer.written, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
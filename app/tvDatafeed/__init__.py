@@ -2,5 +2,6 @@ from .main import TvDatafeed, Interval
 from .seis import Seis
 from .datafeed import TvDatafeedLive
 from .consumer import Consumer
+from .pool import TvDatafeedPool
 
 __version__ = "2.1.0"
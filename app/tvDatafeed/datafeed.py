@@ -1,5 +1,5 @@
 import threading, queue, time, logging
-import tvDatafeed 
+from app import tvDatafeed
 from datetime import datetime as dt
 from dateutil.relativedelta import relativedelta as rd
 
@@ -26,6 +26,8 @@ class TvDatafeedLive(tvDatafeed.TvDatafeed):
         TradingView username (default None)
     password : str, optional
         TradingView password (default None)
+    ws_url : str, optional
+        chart websocket url, e.g. a local fake server (default TradingView)
     
     Methods
     -------
@@ -175,8 +177,8 @@ class TvDatafeedLive(tvDatafeed.TvDatafeed):
             
             return False
     
-    def __init__(self, username=None, password=None):
-        super().__init__(username, password)
+    def __init__(self, username=None, password=None, ws_url=None):
+        super().__init__(username, password, ws_url)
         
         self._lock=threading.Lock()
         self._main_thread = None  
@@ -1,12 +1,18 @@
-import datetime
 import enum
 import json
 import logging
 import random
-import re
 import string
+from collections import deque
 import pandas as pd
-from websocket import create_connection
+from websocket import create_connection, WebSocketException
+from .protocol import (
+    FrameDecoder,
+    ProtocolError,
+    SeriesBuffer,
+    decode_message,
+    is_heartbeat,
+)
 import requests
 import json
 
@@ -32,23 +38,54 @@ class Interval(enum.Enum):
 class TvDatafeed:
     __sign_in_url = 'https://www.tradingview.com/accounts/signin/'
     __search_url = 'https://symbol-search.tradingview.com/symbol_search/?text={}&hl=1&exchange={}&lang=en&type=&domain=production'
+    __ws_url = "wss://data.tradingview.com/socket.io/websocket"
     __ws_headers = json.dumps({"Origin": "https://data.tradingview.com"})
     __signin_headers = {'Referer': 'https://www.tradingview.com'}
     __ws_timeout = 5
+    __reconnect_attempts = 2
+    __max_series = 10
+    __quote_fields = [
+        "ch",
+        "chp",
+        "current_session",
+        "description",
+        "local_description",
+        "language",
+        "exchange",
+        "fractional",
+        "is_tradable",
+        "lp",
+        "lp_time",
+        "minmov",
+        "minmove2",
+        "original_name",
+        "pricescale",
+        "pro_name",
+        "short_name",
+        "type",
+        "update_mode",
+        "volume",
+        "currency_code",
+        "rchp",
+        "rtc",
+    ]
 
     def __init__(
         self,
         username: str = None,
         password: str = None,
+        ws_url: str = None,
     ) -> None:
         """Create TvDatafeed object
 
         Args:
             username (str, optional): tradingview username. Defaults to None.
             password (str, optional): tradingview password. Defaults to None.
+            ws_url (str, optional): chart websocket, e.g. a local fake server. Defaults to TradingView's.
         """
 
         self.ws_debug = False
+        self.ws_url = ws_url or self.__ws_url
 
         self.token = self.__auth(username, password)
 
@@ -61,6 +98,7 @@ class TvDatafeed:
         self.ws = None
         self.session = self.__generate_session()
         self.chart_session = self.__generate_chart_session()
+        self.__series_count = 0
 
     def __auth(self, username, password):
 
@@ -82,20 +120,36 @@ class TvDatafeed:
         return token
 
     def __create_connection(self):
-        logging.debug("creating websocket connection")
+        logger.debug("creating websocket connection")
+        self.close()
+        # frames are decoded across calls, a recv may end mid-frame
+        self.__decoder = FrameDecoder()
+        self.__payloads = deque()
         self.ws = create_connection(
-            "wss://data.tradingview.com/socket.io/websocket", headers=self.__ws_headers, timeout=self.__ws_timeout
+            self.ws_url, headers=self.__ws_headers, timeout=self.__ws_timeout
         )
 
-    @staticmethod
-    def __filter_raw_message(text):
-        try:
-            found = re.search('"m":"(.+?)",', text).group(1)
-            found2 = re.search('"p":(.+?"}"])}', text).group(1)
+        # sessions live as long as the connection and are shared by every get_hist call
+        self.__send_message("set_auth_token", [self.token])
+        self.__send_message("chart_create_session", [self.chart_session, ""])
+        self.__send_message("quote_create_session", [self.session])
+        self.__send_message(
+            "quote_set_fields", [self.session, *self.__quote_fields])
+        self.__send_message("switch_timezone", [
+                            self.chart_session, "exchange"])
 
-            return found, found2
-        except AttributeError:
-            logger.error("error in filter_raw_message")
+    def __ensure_connection(self):
+        if self.ws is None or not self.ws.connected:
+            self.__create_connection()
+
+    def close(self):
+        """close the websocket connection, the next request opens a new one"""
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except Exception as e:
+                logger.debug(f"error while closing websocket: {e}")
+            self.ws = None
 
     @staticmethod
     def __generate_session():
@@ -130,45 +184,6 @@ class TvDatafeed:
             print(m)
         self.ws.send(m)
 
-    @staticmethod
-    def __create_df(raw_data, symbol):
-        try:
-            out = re.search('"s":\[(.+?)\}\]', raw_data).group(1)
-            x = out.split(',{"')
-            data = list()
-            volume_data = True
-
-            for xi in x:
-                xi = re.split("\[|:|,|\]", xi)
-                ts = datetime.datetime.fromtimestamp(float(xi[4]))
-
-                row = [ts]
-
-                for i in range(5, 10):
-
-                    # skip converting volume data if does not exists
-                    if not volume_data and i == 9:
-                        row.append(0.0)
-                        continue
-                    try:
-                        row.append(float(xi[i]))
-
-                    except ValueError:
-                        volume_data = False
-                        row.append(0.0)
-                        logger.debug('no volume data')
-
-                data.append(row)
-
-            data = pd.DataFrame(
-                data, columns=["datetime", "open",
-                               "high", "low", "close", "volume"]
-            ).set_index("datetime")
-            data.insert(0, "symbol", value=symbol)
-            return data
-        except AttributeError:
-            logger.error("no data, please check the exchange and symbol")
-
     @staticmethod
     def __format_symbol(symbol, exchange, contract: int = None):
 
@@ -207,46 +222,73 @@ class TvDatafeed:
         Returns:
             pd.Dataframe: dataframe with sohlcv as columns
         """
-        symbol = self.__format_symbol(
-            symbol=symbol, exchange=exchange, contract=fut_contract
-        )
+        for _, data in self.get_hist_many(
+            [symbol], exchange, interval, n_bars, fut_contract, extended_session
+        ):
+            return data
 
-        interval = interval.value
+    def get_hist_many(
+        self,
+        symbols,
+        exchange: str = "NSE",
+        interval: Interval = Interval.in_daily,
+        n_bars: int = 1,
+        fut_contract: int = None,
+        extended_session: bool = False,
+        max_series: int = None,
+    ):
+        """get historical data of several symbols over one connection
 
-        self.__create_connection()
+        Up to max_series series are requested at once on the chart session and
+        each is yielded as soon as it completes, so the order of the results
+        follows the server rather than symbols.
 
-        self.__send_message("set_auth_token", [self.token])
-        self.__send_message("chart_create_session", [self.chart_session, ""])
-        self.__send_message("quote_create_session", [self.session])
-        self.__send_message(
-            "quote_set_fields",
-            [
-                self.session,
-                "ch",
-                "chp",
-                "current_session",
-                "description",
-                "local_description",
-                "language",
-                "exchange",
-                "fractional",
-                "is_tradable",
-                "lp",
-                "lp_time",
-                "minmov",
-                "minmove2",
-                "original_name",
-                "pricescale",
-                "pro_name",
-                "short_name",
-                "type",
-                "update_mode",
-                "volume",
-                "currency_code",
-                "rchp",
-                "rtc",
-            ],
-        )
+        Args:
+            symbols (list): symbol names, as for get_hist
+            exchange, interval, n_bars, fut_contract, extended_session: as for get_hist
+            max_series (int, optional): series requested concurrently. Defaults to 10.
+
+        Yields:
+            tuple: (symbol, pd.Dataframe), the frame is None when no data was received
+        """
+        max_series = max_series or self.__max_series
+        remaining = {
+            self.__format_symbol(
+                symbol=symbol, exchange=exchange, contract=fut_contract
+            ): symbol
+            for symbol in symbols
+        }
+
+        for attempt in range(self.__reconnect_attempts + 1):
+            if not remaining:
+                break
+            try:
+                self.__ensure_connection()
+                for symbol, series in self.__stream_series(
+                    list(remaining), interval.value, n_bars, extended_session, max_series
+                ):
+                    data = series.to_frame(symbol)
+                    if data is None:
+                        logger.error(
+                            f"no data for {symbol}, please check the exchange and symbol")
+                    yield remaining.pop(symbol), data
+            except (WebSocketException, OSError, ProtocolError) as e:
+                # the server drops idle connections, so reconnect and retry
+                # the series that had not completed yet
+                logger.error(e)
+                self.close()
+                if attempt < self.__reconnect_attempts:
+                    logger.debug(f"reconnecting, attempt {attempt + 1}")
+
+        for symbol in list(remaining.values()):
+            logger.error(f"no data for {symbol}, giving up after reconnecting")
+            yield symbol, None
+
+    def __open_series(self, symbol, interval, n_bars, extended_session):
+        # every request gets its own ids so late updates of earlier series are ignored
+        self.__series_count += 1
+        series_id = f"s{self.__series_count}"
+        symbol_id = f"symbol_{self.__series_count}"
 
         self.__send_message(
             "quote_add_symbols", [self.session, symbol,
@@ -258,7 +300,7 @@ class TvDatafeed:
             "resolve_symbol",
             [
                 self.chart_session,
-                "symbol_1",
+                symbol_id,
                 '={"symbol":"'
                 + symbol
                 + '","adjustment":"splits","session":'
@@ -268,26 +310,153 @@ class TvDatafeed:
         )
         self.__send_message(
             "create_series",
-            [self.chart_session, "s1", "s1", "symbol_1", interval, n_bars],
+            [self.chart_session, series_id, series_id, symbol_id, interval, n_bars],
         )
-        self.__send_message("switch_timezone", [
-                            self.chart_session, "exchange"])
+        logger.debug(f"getting data for {symbol}...")
+        return series_id, symbol_id
 
-        raw_data = ""
+    def __close_series(self, series_id, symbol):
+        self.__send_message("remove_series", [self.chart_session, series_id])
+        self.__send_message("quote_remove_symbols", [self.session, symbol])
 
-        logger.debug(f"getting data for {symbol}...")
+    def __messages(self):
+        # decoded (type, params) of every message, heartbeats are answered here.
+        # Payloads left over when a request completes stay queued for the next one
         while True:
-            try:
-                result = self.ws.recv()
-                raw_data = raw_data + result + "\n"
-            except Exception as e:
-                logger.error(e)
-                break
+            while self.__payloads:
+                payload = self.__payloads.popleft()
+                if is_heartbeat(payload):
+                    # heartbeats must be echoed to keep the connection open
+                    self.ws.send(self.__prepend_header(payload))
+                    continue
+                yield decode_message(payload)
+            self.__payloads.extend(self.__decoder.feed(self.ws.recv()))
+
+    def __stream_series(self, symbols, interval, n_bars, extended_session, max_series):
+        pending = list(reversed(symbols))
+        active = {}  # series id -> (symbol, SeriesBuffer)
+        symbol_ids = {}  # symbol id -> series id
+        messages = self.__messages()
+
+        while pending or active:
+            while pending and len(active) < max_series:
+                symbol = pending.pop()
+                series_id, symbol_id = self.__open_series(
+                    symbol, interval, n_bars, extended_session)
+                active[series_id] = (symbol, SeriesBuffer(n_bars))
+                symbol_ids[symbol_id] = series_id
+
+            func, params = next(messages)
+            completed = None
+            if func in ("timescale_update", "du"):
+                updates = params[1] if len(params) > 1 else {}
+                for series_id in active.keys() & updates.keys():
+                    active[series_id][1].add(updates[series_id].get("s", []))
+            elif func == "series_completed":
+                completed = next((p for p in params[1:] if p in active), None)
+            elif func == "symbol_error" and len(params) > 1:
+                completed = symbol_ids.get(params[1])
+                logger.error(f"error resolving symbol: {params}")
+            elif func == "series_error" and len(params) > 1:
+                completed = params[1] if params[1] in active else None
+                logger.error(f"error loading series: {params}")
+
+            if completed in active:
+                symbol, series = active.pop(completed)
+                self.__close_series(completed, symbol)
+                yield symbol, series
+
+    def get_hist_pages(
+        self,
+        symbol: str,
+        exchange: str = "NSE",
+        interval: Interval = Interval.in_daily,
+        page_bars: int = 5000,
+        start=None,
+        max_bars: int = None,
+        fut_contract: int = None,
+        extended_session: bool = False,
+    ):
+        """get historical data beyond the 5000 bar limit, one page at a time
 
-            if "series_completed" in result:
-                break
+        The first page holds the latest page_bars bars; every further page is
+        requested on the same series with request_more_data and holds bars
+        older than the previous one. Only one page is kept in memory.
+
+        Args:
+            symbol, exchange, interval, fut_contract, extended_session: as for get_hist
+            page_bars (int, optional): bars per request, max 5000. Defaults to 5000.
+            start (datetime, optional): stop once bars reach back to this local
+                time, older bars are dropped. Defaults to None.
+            max_bars (int, optional): stop after this many bars. Defaults to None,
+                in which case pages are requested until the history is exhausted.
+
+        Yields:
+            pd.Dataframe: pages of bars, newest first
+        """
+        symbol = self.__format_symbol(
+            symbol=symbol, exchange=exchange, contract=fut_contract
+        )
+        start = pd.Timestamp(start) if start is not None else None
+
+        self.__ensure_connection()
+        messages = self.__messages()
+        series_id, symbol_id = self.__open_series(
+            symbol, interval.value, page_bars, extended_session)
+        oldest = None
+        total = 0
+        try:
+            while True:
+                page = self.__load_page(messages, symbol, series_id, symbol_id, page_bars)
+                if page is not None and oldest is not None:
+                    page = page[page.index < oldest]
+                if page is None or page.empty:
+                    logger.debug(f"history of {symbol} exhausted after {total} bars")
+                    break
+
+                oldest = page.index[0]
+                done = False
+                if start is not None and oldest <= start:
+                    page = page[page.index >= start]
+                    done = True
+                if max_bars is not None and total + len(page) >= max_bars:
+                    page = page.iloc[len(page) - (max_bars - total):]
+                    done = True
+
+                total += len(page)
+                if not page.empty:
+                    yield page
+                if done:
+                    break
+
+                self.__send_message(
+                    "request_more_data", [self.chart_session, series_id, page_bars])
+        except (WebSocketException, OSError, ProtocolError):
+            # pages already yielded stay valid, the caller decides whether to retry
+            self.close()
+            raise
+        except GeneratorExit:
+            # the caller stopped early, free the series for the next request
+            self.__close_series(series_id, symbol)
+            raise
+        else:
+            self.__close_series(series_id, symbol)
 
-        return self.__create_df(raw_data, symbol)
+    @staticmethod
+    def __load_page(messages, symbol, series_id, symbol_id, page_bars):
+        page = SeriesBuffer(page_bars)
+        for func, params in messages:
+            if func == "timescale_update":
+                updates = params[1] if len(params) > 1 else {}
+                if series_id in updates:
+                    page.add(updates[series_id].get("s", []), by_index=False)
+            elif func == "series_completed" and (series_id in params or len(params) < 2):
+                return page.to_frame(symbol)
+            elif func in ("symbol_error", "series_error") and (
+                symbol_id in params or series_id in params
+            ):
+                logger.error(f"error loading history of {symbol}: {params}")
+                return None
 
     def search_symbol(self, text: str, exchange: str = ''):
         url = self.__search_url.format(text, exchange)
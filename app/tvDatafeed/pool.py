@@ -0,0 +1,179 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from .main import TvDatafeed
+
+logger = logging.getLogger(__name__)
+
+
+class TvDatafeedPool:
+    """Thread-safe pool of TvDatafeed clients
+
+    A TvDatafeed keeps a single websocket and chart session, so it must not be
+    used by two threads at once. The pool hands every caller its own client
+    and keeps idle clients connected for the next caller.
+
+    Args:
+        size (int, optional): maximum number of clients, and therefore
+            concurrent connections. Defaults to 4.
+        username (str, optional): tradingview username. Defaults to None.
+        password (str, optional): tradingview password. Defaults to None.
+        max_idle (float, optional): seconds after which an idle connection is
+            considered stale and reopened before use. Defaults to 60.
+        factory (callable, optional): creates a client, for tests or
+            subclasses. Defaults to TvDatafeed(username, password).
+    """
+
+    def __init__(
+        self,
+        size: int = 4,
+        username: str = None,
+        password: str = None,
+        max_idle: float = 60,
+        factory=None,
+    ) -> None:
+        self.size = size
+        self.max_idle = max_idle
+        self.__factory = factory or (lambda: TvDatafeed(username, password))
+        self.__idle = queue.LifoQueue()
+        self.__slots = threading.BoundedSemaphore(size)
+        self.__clients = []
+        self.__lock = threading.Lock()
+
+    def __checkout(self):
+        try:
+            tv, released_at = self.__idle.get_nowait()
+        except queue.Empty:
+            tv = self.__factory()
+            with self.__lock:
+                self.__clients.append(tv)
+            logger.debug(f"created client {len(self.__clients)} of {self.size}")
+            return tv
+
+        # the server silently drops idle sockets, reopen them before use
+        if not self.is_healthy(tv) or time.monotonic() - released_at > self.max_idle:
+            tv.close()
+        return tv
+
+    @staticmethod
+    def is_healthy(tv):
+        return tv.ws is None or tv.ws.connected
+
+    def acquire(self, timeout=None):
+        """take a client out of the pool, blocking while all are in use
+
+        Returns:
+            TvDatafeed: a client that must be given back with release()
+        """
+        if not self.__slots.acquire(timeout=timeout):
+            raise TimeoutError("no TvDatafeed client available")
+        try:
+            return self.__checkout()
+        except Exception:
+            self.__slots.release()
+            raise
+
+    def release(self, tv, discard=False):
+        """give a client back to the pool, closing its connection if discarded"""
+        if discard:
+            tv.close()
+        self.__idle.put((tv, time.monotonic()))
+        self.__slots.release()
+
+    @contextmanager
+    def client(self, timeout=None):
+        tv = self.acquire(timeout)
+        try:
+            yield tv
+        except Exception:
+            self.release(tv, discard=True)
+            raise
+        else:
+            self.release(tv)
+
+    def get_hist(self, *args, **kwargs):
+        """TvDatafeed.get_hist on a pooled client, safe to call from any thread"""
+        with self.client() as tv:
+            data = tv.get_hist(*args, **kwargs)
+            if data is None:
+                # the connection may be in an unknown state after a failed request
+                tv.close()
+            return data
+
+    def get_hist_pages(self, *args, **kwargs):
+        """TvDatafeed.get_hist_pages on a pooled client held until the last page"""
+        tv = self.acquire()
+        discard = True
+        try:
+            yield from tv.get_hist_pages(*args, **kwargs)
+            discard = False
+        except GeneratorExit:
+            # stopped early by the caller, the series was closed cleanly
+            discard = False
+            raise
+        finally:
+            self.release(tv, discard)
+
+    def get_hist_many(self, symbols, *args, connections=None, **kwargs):
+        """TvDatafeed.get_hist_many spread over several pooled clients
+
+        Args:
+            symbols (list): symbol names
+            connections (int, optional): clients used at once. Defaults to the
+                pool size.
+            *args, **kwargs: passed to TvDatafeed.get_hist_many
+
+        Yields:
+            tuple: (symbol, pd.Dataframe or None) in order of completion
+        """
+        symbols = list(symbols)
+        if not symbols:
+            return
+        connections = max(1, min(connections or self.size, len(symbols)))
+        results = queue.Queue()
+        done = object()
+
+        def fetch(chunk):
+            pending = set(chunk)
+            try:
+                with self.client() as tv:
+                    for symbol, data in tv.get_hist_many(chunk, *args, **kwargs):
+                        pending.discard(symbol)
+                        results.put((symbol, data))
+            except Exception as e:
+                logger.error(f"error fetching {len(pending)} symbols: {e}")
+                for symbol in pending:
+                    results.put((symbol, None))
+            finally:
+                results.put(done)
+
+        threads = [
+            threading.Thread(target=fetch, args=(symbols[i::connections],), daemon=True)
+            for i in range(connections)
+        ]
+        for thread in threads:
+            thread.start()
+
+        finished = 0
+        while finished < len(threads):
+            item = results.get()
+            if item is done:
+                finished += 1
+            else:
+                yield item
+
+    def close(self):
+        """close every client connection, the pool stays usable"""
+        with self.__lock:
+            clients = list(self.__clients)
+        for tv in clients:
+            tv.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
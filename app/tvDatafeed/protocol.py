@@ -0,0 +1,206 @@
+import functools
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytz
+from dateutil.tz import tzlocal
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_PREFIX = "~h~"
+FRAME_MARKER = "~m~"
+BAR_FIELDS = ["open", "high", "low", "close", "volume"]
+
+
+class ProtocolError(ValueError):
+    """raised when the stream does not follow the ~m~<length>~m~ framing"""
+
+
+def prepend_header(payload):
+    return FRAME_MARKER + str(len(payload)) + FRAME_MARKER + payload
+
+
+def is_heartbeat(payload):
+    return payload.startswith(HEARTBEAT_PREFIX)
+
+
+@functools.lru_cache(maxsize=None)
+def local_timezone():
+    """timezone of this machine, by name when possible
+
+    pandas converts named zones in bulk while tzlocal() is called per bar.
+    """
+    name = os.environ.get("TZ", "").lstrip(":")
+    if not name:
+        path = os.path.realpath("/etc/localtime")
+        if "zoneinfo/" in path:
+            name = path.split("zoneinfo/", 1)[1]
+    if name:
+        try:
+            return pytz.timezone(name)
+        except pytz.UnknownTimeZoneError:
+            pass
+    if time.timezone == 0 and not time.daylight:
+        return pytz.utc
+    return tzlocal()
+
+
+class FrameDecoder:
+    """Incremental decoder for the TradingView ~m~<length>~m~<payload> framing
+
+    A websocket message may carry several frames and, in principle, a frame
+    may span messages. feed() returns the payloads completed so far and keeps
+    only the unfinished tail, so every character is scanned once.
+    """
+
+    def __init__(self):
+        self.__pending = ""
+
+    def feed(self, data):
+        """decode the frames completed by data
+
+        Args:
+            data (str): the next websocket message
+
+        Returns:
+            list: payloads of every complete frame, in order
+
+        Raises:
+            ProtocolError: the stream is not framed as expected
+        """
+        buffer = self.__pending + data if self.__pending else data
+        payloads = []
+        position = 0
+        while position < len(buffer):
+            if not buffer.startswith(FRAME_MARKER, position):
+                if FRAME_MARKER.startswith(buffer[position:]):
+                    break  # marker split across messages
+                self.__pending = ""
+                raise ProtocolError(
+                    f"expected frame marker at {buffer[position:position + 20]!r}"
+                )
+
+            header_end = buffer.find(FRAME_MARKER, position + len(FRAME_MARKER))
+            if header_end == -1:
+                break
+            length = buffer[position + len(FRAME_MARKER) : header_end]
+            if not length.isdigit():
+                self.__pending = ""
+                raise ProtocolError(f"invalid frame length {length!r}")
+
+            start = header_end + len(FRAME_MARKER)
+            end = start + int(length)
+            if end > len(buffer):
+                break
+            payloads.append(buffer[start:end])
+            position = end
+
+        self.__pending = buffer[position:]
+        return payloads
+
+    @property
+    def pending(self):
+        """number of characters waiting for the rest of their frame"""
+        return len(self.__pending)
+
+
+def decode_message(payload):
+    """split a JSON payload into its message type and parameters"""
+    try:
+        message = json.loads(payload)
+    except ValueError as e:
+        raise ProtocolError(f"invalid message payload: {e}") from e
+    return message.get("m"), message.get("p", [])
+
+
+class SeriesBuffer:
+    """Preallocated OHLCV storage for one chart series
+
+    Bars arrive as {"i": index, "v": [time, open, high, low, close, volume]}
+    in timescale_update and du messages. They are written straight into a
+    float64 array at their index, so a series is never held as text or as
+    Python floats.
+
+    Args:
+        capacity (int): expected number of bars, the buffer grows if exceeded
+    """
+
+    width = 1 + len(BAR_FIELDS)
+
+    def __init__(self, capacity):
+        self.values = np.zeros((max(int(capacity), 1), self.width))
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def __reserve(self, size):
+        if size > len(self.values):
+            grown = np.zeros((max(size, 2 * len(self.values)), self.width))
+            grown[: self.length] = self.values[: self.length]
+            self.values = grown
+
+    def add(self, bars, by_index=True):
+        """write bars into the buffer
+
+        Args:
+            bars (list): bars as sent by the server
+            by_index (bool): write bars at their "i" index, later bars replace
+                earlier ones at the same index. When False they are appended,
+                e.g. for pages of older bars whose indexes restart.
+        """
+        if not bars:
+            return
+        if by_index:
+            indexes = np.fromiter(
+                (bar["i"] for bar in bars), dtype=np.int64, count=len(bars)
+            )
+        else:
+            indexes = np.arange(self.length, self.length + len(bars))
+        rows = [bar["v"] for bar in bars]
+        self.__reserve(int(indexes.max()) + 1)
+
+        try:
+            block = np.array(rows, dtype=np.float64)
+        except (ValueError, TypeError):
+            block = None
+        if block is not None and block.ndim == 2:
+            columns = min(block.shape[1], self.width)
+            self.values[indexes, :columns] = block[:, :columns]
+        else:
+            # ragged rows, volume is missing for some bars
+            for index, row in zip(indexes, rows):
+                row = [
+                    np.nan if value is None else value for value in row[: self.width]
+                ]
+                self.values[index, : len(row)] = row
+
+        self.length = max(self.length, int(indexes.max()) + 1)
+
+    def to_frame(self, symbol):
+        """build the get_hist frame, None if no bars were received"""
+        values = self.values[: self.length]
+        values = values[values[:, 0] > 0]
+        if not len(values):
+            return None
+        if np.any(np.diff(values[:, 0]) <= 0):
+            # appended bars may be out of order or repeated, keep the last copy
+            values = values[np.argsort(values[:, 0], kind="stable")]
+            values = values[np.append(np.diff(values[:, 0]) > 0, True)]
+
+        volume = np.nan_to_num(values[:, 5])
+        # bar times are epoch seconds, shown in local wall time
+        index = (
+            pd.to_datetime(values[:, 0], unit="s", utc=True)
+            .tz_convert(local_timezone())
+            .tz_localize(None)
+            .rename("datetime")
+        )
+        data = pd.DataFrame(values[:, 1:5], index=index, columns=BAR_FIELDS[:4])
+        data["volume"] = volume
+        data.insert(0, "symbol", value=symbol)
+        return data
@@ -1,4 +1,4 @@
-import tvDatafeed
+from app import tvDatafeed
 
 class Seis(object):
     """